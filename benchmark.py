@@ -0,0 +1,154 @@
+"""
+Benchmark of the concurrency patterns used in the demos. The docstrings of threads_compare.py and
+threads_types.py say things like "5s in parallel vs 3+3s sequential", this script measures them.
+
+Every pattern runs n units of work, for every n in --sizes:
+    sequential    - await unit() one by one, like "await do_stuff(2)" in await.py
+    gather        - await asyncio.gather(unit(), unit(), ...)
+    tasks         - asyncio.create_task(unit()) for all units and then await every task
+    thread_pool   - loop.run_in_executor(ThreadPoolExecutor, blocking_unit) for all units
+    process_pool  - loop.run_in_executor(ProcessPoolExecutor, cpu_unit) for all units
+    sleep0_yield  - n tasks that each give the control back to asyncio with asyncio.sleep(0)
+
+For each run it reports
+    throughput    - units per second
+    p50/p99       - latency of a unit in ms, from when it was issued until it was done
+    peak_rss_kb   - peak RSS of the run (ru_maxrss, includes the interpreter itself)
+    max_loop_lag  - the longest time in ms a timer callback was delayed during the run
+as JSON on stdout, one object per line, so the output can be saved and compared between versions.
+ru_maxrss is the peak of the whole process and never goes down, so every (pattern, n) runs in a
+new python process, else every run would show the peak of the biggest run before it.
+
+Usage:
+    python benchmark.py --sizes 1,10,100,1000,10000,100000 --patterns gather,tasks
+
+Printout (python benchmark.py --sizes 100 --patterns gather,sequential):
+    {"pattern": "gather", "n": 100, "seconds": 0.0117, "throughput": 8583.5, "p50_ms": 11.5, "p99_ms": 11.5, "peak_rss_kb": 21272, "max_loop_lag_ms": 0.9}
+    {"pattern": "sequential", "n": 100, "seconds": 1.0479, "throughput": 95.4, "p50_ms": 10.4, "p99_ms": 13.8, "peak_rss_kb": 21148, "max_loop_lag_ms": 4.7}
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import resource
+import sys
+import time
+
+UNIT_SLEEP = 0.01  # Time each unit waits, in seconds
+
+async def unit(issued, done):
+    await asyncio.sleep(UNIT_SLEEP)
+    done.append(time.perf_counter() - issued)
+
+def blocking_unit():
+    time.sleep(UNIT_SLEEP)
+
+def cpu_unit():
+    return sum(i * i for i in range(10 ** 4))
+
+async def yield_unit(issued, done):
+    for _ in range(10):
+        await asyncio.sleep(0)
+    done.append(time.perf_counter() - issued)
+
+async def run_sequential(n, done):
+    for _ in range(n):
+        await unit(time.perf_counter(), done)
+
+async def run_gather(n, done):
+    issued = time.perf_counter()
+    await asyncio.gather(*(unit(issued, done) for _ in range(n)))
+
+async def run_tasks(n, done):
+    issued = time.perf_counter()
+    tasks = [asyncio.create_task(unit(issued, done)) for _ in range(n)]
+    for task in tasks:
+        await task
+
+async def run_sleep0_yield(n, done):
+    issued = time.perf_counter()
+    await asyncio.gather(*(yield_unit(issued, done) for _ in range(n)))
+
+async def run_in_pool(pool, func, n, done):
+    loop = asyncio.get_running_loop()
+    issued = time.perf_counter()
+
+    async def one():
+        await loop.run_in_executor(pool, func)
+        done.append(time.perf_counter() - issued)
+    await asyncio.gather(*(one() for _ in range(n)))
+
+async def run_thread_pool(n, done):
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        await run_in_pool(pool, blocking_unit, n, done)
+
+async def run_process_pool(n, done):
+    with concurrent.futures.ProcessPoolExecutor() as pool:
+        await run_in_pool(pool, cpu_unit, n, done)
+
+PATTERNS = {
+    "sequential": run_sequential,
+    "gather": run_gather,
+    "tasks": run_tasks,
+    "thread_pool": run_thread_pool,
+    "process_pool": run_process_pool,
+    "sleep0_yield": run_sleep0_yield,
+}
+
+async def lag_monitor(lags, interval=0.005):
+    # Measures how late the event loop wakes up this task compared to when it asked to be woken up
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - expected)
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def bench(pattern, n):
+    done, lags = [], []
+    monitor = asyncio.create_task(lag_monitor(lags))
+    await asyncio.sleep(0)  # Let the monitor start
+
+    start = time.perf_counter()
+    await PATTERNS[pattern](n, done)
+    seconds = time.perf_counter() - start
+
+    monitor.cancel()
+    return {
+        "pattern": pattern,
+        "n": n,
+        "seconds": round(seconds, 4),
+        "throughput": round(n / seconds, 1),
+        "p50_ms": round(percentile(done, 50) * 1000, 1),
+        "p99_ms": round(percentile(done, 99) * 1000, 1),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "max_loop_lag_ms": round(max(lags, default=0.0) * 1000, 1),
+    }
+
+async def run_in_subprocess(pattern, n):
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, __file__, "--run", f"{pattern}:{n}", stdout=asyncio.subprocess.PIPE)
+    stdout, _ = await proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(f"Run of {pattern} with n={n} failed with exit code {proc.returncode}")
+    return stdout.decode().strip()
+
+async def main(args):
+    if args.run:
+        pattern, n = args.run.split(":")
+        print(json.dumps(await bench(pattern, int(n))), flush=True)
+        return
+    for pattern in args.patterns.split(","):
+        for n in [int(size) for size in args.sizes.split(",")]:
+            print(await run_in_subprocess(pattern, n), flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1,10,100,1000", help="comma separated number of units")
+    parser.add_argument("--patterns", default=",".join(PATTERNS), help="comma separated patterns")
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # pattern:n, one run in this process
+    asyncio.run(main(parser.parse_args()))
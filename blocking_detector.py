@@ -0,0 +1,109 @@
+"""
+This demo shows how to detect that a coroutine is blocking the event loop, like time.sleep() does
+in await.py, await3.py and sleep.py.
+
+The LoopWatchdog schedules a tiny heartbeat callback on the event loop that just stores the time it
+ran. A side thread checks that time. If the loop has not run the heartbeat for longer than the
+threshold, the loop is stuck somewhere, and the side thread grabs the stack of the loop thread
+(sys._current_frames()) and the task that is currently executing. Since the heartbeat only runs a
+few times per threshold the overhead is negligible when nothing is blocking.
+
+Printout:
+    Main starts
+    Starting my_work
+    Executing my_work
+
+    Loop blocked for 0.3s by task my_work_task (coro my_work):
+      File "blocking_detector.py", line 89, in my_work
+        time.sleep(1)  # Blocks the event loop, will be reported by the watchdog
+    Executing my_work
+    Exiting my_work
+    Doing stuff
+    Doing stuff
+    Exiting main
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+class LoopWatchdog:
+
+    def __init__(self, threshold=0.1, report=None):
+        self.threshold = threshold
+        self.report = report or print_stall
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_beat = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching the running event loop. Must be called from a coroutine."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._loop.call_soon(self._heartbeat)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _heartbeat(self):
+        # Runs on the event loop. Only stores the time and reschedules itself.
+        self._last_beat = time.monotonic()
+        if not self._stop.is_set():
+            self._loop.call_later(self.threshold / 2, self._heartbeat)
+
+    def _watch(self):
+        # Runs in the side thread
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat
+            # Only report each stall once, even if it lasts for many thresholds
+            if blocked < self.threshold or last_beat == reported_beat:
+                continue
+            reported_beat = last_beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.extract_stack(frame) if frame is not None else []
+            self.report(blocked, asyncio.current_task(self._loop), stack)
+
+def print_stall(blocked, task, stack):
+    if task is not None:
+        who = f"task {task.get_name()} (coro {task.get_coro().__qualname__})"
+    else:
+        who = "a callback (no task)"
+    print(f"\nLoop blocked for {blocked:.1f}s by {who}:")
+    # The innermost frame is where the loop is stuck
+    print("".join(traceback.format_list(stack[-1:])), end="")
+
+async def my_work():
+    print("Starting my_work")
+    for _ in range(2):
+        print("Executing my_work")
+        time.sleep(1)  # Blocks the event loop, will be reported by the watchdog
+    print("Exiting my_work")
+
+async def do_stuff():
+    for _ in range(2):
+        print("Doing stuff")
+        await asyncio.sleep(0.5)  # Gives control back to asyncio, will not be reported
+
+async def main():
+    print("Main starts")
+    watchdog = LoopWatchdog(threshold=0.3)
+    watchdog.start()
+
+    await asyncio.create_task(my_work(), name="my_work_task")
+    await asyncio.create_task(do_stuff(), name="do_stuff_task")
+
+    watchdog.stop()
+    print("Exiting main")
+
+if __name__ == "__main__":
+    asyncio.run(main())
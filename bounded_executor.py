@@ -0,0 +1,166 @@
+"""
+This demo shows how to keep a burst of run_in_executor() calls from using up all memory.
+
+The work queue of the default executor (and of every ThreadPoolExecutor) has no limit, so
+threads_compare.py and threads_combined.py could queue millions of sleeper/step2 calls, each with
+its future and arguments. BoundedExecutor only hands as many calls to the thread pool as it has
+workers and keeps the rest in its own queue, which holds at most queue_size calls. When it is full:
+    block        - submit() waits until there is room, which slows down the producer (backpressure)
+    reject       - submit() raises asyncio.QueueFull
+    drop_oldest  - the oldest queued call raises CallDropped to make room (the new call itself when
+                   queue_size is 0)
+    caller_runs  - the call is run directly by the caller. Note that this blocks the event loop, so
+                   it only makes sense for calls that are short
+The queue is split per caller (by default the current task) and the workers take calls from the
+callers in turn (round robin), so a producer that queues a lot can't keep the others waiting.
+
+Printout:
+    block:       11000 calls done, max queued 100, small producer done after 2019 calls
+    reject:      108 calls done, 10892 rejected
+    drop_oldest: 108 calls done, 10892 dropped
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import time
+
+class CallDropped(Exception):
+    """Raised from submit() for a call that was dropped by the drop_oldest policy."""
+
+class BoundedExecutor:
+
+    def __init__(self, max_workers=4, queue_size=100, policy="block"):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.policy = policy
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.max_queued = 0
+        self._queues = collections.OrderedDict()  # caller -> deque of (seq, future, func, args)
+        self._queued = 0
+        self._running = 0
+        self._space_waiters = collections.OrderedDict()  # caller -> deque of futures
+        self._seq = itertools.count()
+
+    async def submit(self, func, *args, caller=None):
+        """Run func(*args) in the thread pool and return its result."""
+        loop = asyncio.get_running_loop()
+        caller = caller if caller is not None else asyncio.current_task()
+        # A call can go straight to a worker that is free, even with queue_size 0
+        while self._queued >= self.queue_size and self._running >= self.max_workers:
+            if self.policy == "reject":
+                raise asyncio.QueueFull()
+            if self.policy == "caller_runs":
+                return func(*args)
+            if self.policy == "drop_oldest":
+                if not self._queues:
+                    raise CallDropped("Dropped, the executor queue was full")
+                self._drop_oldest()
+                break
+            waiter = loop.create_future()
+            self._space_waiters.setdefault(caller, collections.deque()).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_one()  # It was woken up just before it was cancelled, pass it on
+                raise
+
+        fut = loop.create_future()
+        self._queues.setdefault(caller, collections.deque()).append((next(self._seq), fut, func, args))
+        self._queued += 1
+        self.max_queued = max(self.max_queued, self._queued)
+        self._dispatch()
+        return await fut
+
+    def _drop_oldest(self):
+        caller = min(self._queues, key=lambda c: self._queues[c][0][0])
+        _, fut, _, _ = self._queues[caller].popleft()
+        if not self._queues[caller]:
+            del self._queues[caller]
+        self._queued -= 1
+        if not fut.done():  # Not if the caller was cancelled while waiting in the queue
+            fut.set_exception(CallDropped("Dropped, the executor queue was full"))
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._running < self.max_workers and self._queues:
+            # Take the first caller in the queue and move it last, so the callers take turns
+            caller, queue = next(iter(self._queues.items()))
+            _, fut, func, args = queue.popleft()
+            if queue:
+                self._queues.move_to_end(caller)
+            else:
+                del self._queues[caller]
+            self._queued -= 1
+            self._wake_one()
+            if fut.done():  # The caller was cancelled while waiting in the queue
+                continue
+            self._running += 1
+            loop.run_in_executor(self.pool, func, *args).add_done_callback(
+                lambda result, fut=fut: self._done(fut, result))
+
+    def _done(self, fut, result):
+        self._running -= 1
+        if not fut.done():
+            if result.exception() is not None:
+                fut.set_exception(result.exception())
+            else:
+                fut.set_result(result.result())
+        self._dispatch()
+        if self._running < self.max_workers:
+            self._wake_one()  # Nothing was queued, so a blocked caller can go to the free worker
+
+    def _wake_one(self):
+        # The blocked callers also take turns, else the one that blocked first would fill up the queue
+        while self._space_waiters:
+            caller, waiters = next(iter(self._space_waiters.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._space_waiters.move_to_end(caller)
+            else:
+                del self._space_waiters[caller]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+def sleeper(time_to_sleep):
+    time.sleep(time_to_sleep)
+    return time_to_sleep
+
+async def producer(executor, caller, calls, counters):
+    async def call():
+        try:
+            await executor.submit(sleeper, 0.001, caller=caller)
+            counters["done"] += 1
+            if caller == "small":
+                counters["small done at"] = counters["done"]
+        except asyncio.QueueFull:
+            counters["rejected"] += 1
+        except CallDropped:
+            counters["dropped"] += 1
+    # All calls of a producer have the same caller, even though they run in separate tasks
+    await asyncio.gather(*(call() for _ in range(calls)))
+
+async def run(policy):
+    executor = BoundedExecutor(max_workers=8, queue_size=100, policy=policy)
+    counters = collections.Counter()
+    await asyncio.gather(producer(executor, "greedy", 10000, counters), producer(executor, "small", 1000, counters))
+    executor.shutdown()
+    return executor, counters
+
+async def main():
+    executor, counters = await run("block")
+    print(f"block:       {counters['done']} calls done, max queued {executor.max_queued}, "
+          f"small producer done after {counters['small done at']} calls")
+    executor, counters = await run("reject")
+    print(f"reject:      {counters['done']} calls done, {counters['rejected']} rejected")
+    executor, counters = await run("drop_oldest")
+    print(f"drop_oldest: {counters['done']} calls done, {counters['dropped']} dropped")
+
+if __name__ == "__main__":
+    asyncio.run(main())
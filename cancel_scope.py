@@ -0,0 +1,264 @@
+"""
+This demo shows cancel scopes, which own all tasks that are spawned in them, like a task tree.
+
+await3.py shows my_task spawning do_stuff as a child task and cancel_task.py cancels a flat
+task_list by hand. With deeper trees, cancelling a parent task does not cancel the children it
+created, so they keep running and keep their timers alive.
+
+A CancelScope is used with "async with". Tasks started with scope.spawn() belong to the scope, and
+scopes opened inside it (also in the spawned tasks, it's found through a contextvar) are child
+scopes. cancel() cancels every task in the scope and in all child scopes, and the code inside the
+"async with" block itself. A scope can have a timeout. The deadline is passed on to the child
+scopes, a child can make it shorter but not longer, and only a scope with a deadline of its own
+needs a timer. When the deadline is reached the scope is cancelled and "async with" raises
+TimeoutError. When the block is done, the scope waits for all its tasks, like asyncio.TaskGroup.
+Also like TaskGroup, when a spawned task raises, the whole scope is cancelled and "async with"
+raises an ExceptionGroup with the exceptions of all tasks that failed (and of the block itself).
+
+A scope can also be used without "async with", just to spawn tasks in and cancel them together.
+aclose() cancels the scope and returns the tasks that are still running after a grace period, the
+ones that ignored the cancellation (like task2 in cancel_task.py would if it caught the
+CancelledError and kept looping).
+
+Printout:
+    Starting my_task
+    Do stuff 0
+    Do stuff 1
+    Do stuff 1 cancelled
+    Do stuff 0 cancelled
+    my_task timed out after 0.5s
+    Do stuff 2
+    Do stuff 2 cancelled
+    Scope failed: (ValueError('Bad input'),)
+    Stubborn task ignores the cancel
+    Tasks that ignored cancellation: ['stubborn']
+    Cancelled 10101 tasks in 3 levels in 0.155s
+"""
+
+import asyncio
+import contextvars
+import time
+
+_current_scope = contextvars.ContextVar("cancel_scope", default=None)
+
+class CancelScope:
+
+    def __init__(self, timeout=None, name=""):
+        self.name = name
+        self.parent = None
+        self.children = set()
+        self.tasks = set()
+        self.deadline = None
+        self.cancelled = False
+        self.deadline_reached = False
+        self.errors = []  # Exceptions of the spawned tasks that failed
+        self._timeout = timeout
+        self._host = None  # The task running the "async with" block
+        self._host_cancelled = False  # If this scope cancelled the host, so it must uncancel it
+        self._token = None
+        self._timer = None
+
+    @staticmethod
+    def current():
+        return _current_scope.get()
+
+    def remaining(self):
+        """Seconds left until the deadline, or None if there is no deadline."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - asyncio.get_running_loop().time(), 0.0)
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        self.parent = _current_scope.get()
+        if self.parent is not None:
+            self.parent.children.add(self)
+            self.deadline = self.parent.deadline
+        if self._timeout is not None:
+            own_deadline = loop.time() + self._timeout
+            if self.deadline is None or own_deadline < self.deadline:
+                # Only a scope with a shorter deadline than its parent needs a timer
+                self.deadline = own_deadline
+                self._timer = loop.call_at(own_deadline, self._deadline_reached)
+        self._host = asyncio.current_task()
+        self._token = _current_scope.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        _current_scope.reset(self._token)
+        error = None
+        if exc_type is None:
+            try:
+                await self.wait()
+            except asyncio.CancelledError as e:
+                exc_type, error = asyncio.CancelledError, e
+        self._host = None
+        if exc_type is not None:
+            # Don't leave any children behind, and let them handle the cancellation before leaving
+            self.cancel("Cancel scope exited")
+            try:
+                await self.wait()
+            except asyncio.CancelledError as e:
+                error = e
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.parent is not None:
+            self.parent.children.discard(self)
+
+        if exc_type is asyncio.CancelledError and (self.errors or self.deadline_reached):
+            if not self._host_cancelled or asyncio.current_task().uncancel() > 0:
+                # Also cancelled from outside the scope, pass that on like TaskGroup does
+                if error is not None:
+                    raise error
+                return False
+        if self.errors:
+            errors = list(self.errors)
+            if exc_type is not None and exc_type is not asyncio.CancelledError:
+                errors.append(exc)
+            raise BaseExceptionGroup(f"Tasks in cancel scope {self.name} failed", errors)
+        if exc_type is asyncio.CancelledError and self.deadline_reached:
+            raise TimeoutError(f"Cancel scope {self.name} reached its deadline")
+        if error is not None:
+            raise error
+        return False
+
+    def spawn(self, coro, name=None):
+        """Create a task that belongs to this scope."""
+        context = contextvars.copy_context()
+        context.run(_current_scope.set, self)
+        task = asyncio.get_running_loop().create_task(coro, name=name, context=context)
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+        if self.cancelled:
+            task.cancel("Cancel scope is cancelled")
+        return task
+
+    def cancel(self, msg="Cancel scope cancelled"):
+        """Cancel all tasks in this scope and its child scopes."""
+        # Nested scopes in the same task share the host task, so collect the tasks first to cancel
+        # each of them only once
+        for task in self._mark_cancelled():
+            if task is self._host:
+                if self._host_cancelled:
+                    continue  # Cancelled once is enough, it's uncancelled once in __aexit__
+                self._host_cancelled = True
+            task.cancel(msg)
+
+    def _task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors.append(task.exception())
+            self.cancel(f"A task in cancel scope {self.name} failed")
+
+    def _mark_cancelled(self):
+        self.cancelled = True
+        tasks = set(self.tasks)
+        if self._host is not None:
+            tasks.add(self._host)
+        for child in self.children:
+            tasks |= child._mark_cancelled()
+        return tasks
+
+    def all_tasks(self):
+        """All tasks in this scope and in the child scopes."""
+        tasks = set(self.tasks)
+        for child in self.children:
+            tasks |= child.all_tasks()
+        return tasks
+
+    async def wait(self, timeout=None):
+        """Wait until all tasks in the scope are done. Returns the tasks still running at timeout."""
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + timeout if timeout is not None else None
+        while True:
+            pending = self.all_tasks()
+            if not pending:
+                return set()
+            remaining = end_time - loop.time() if end_time is not None else None
+            if remaining is not None and remaining <= 0:
+                return pending
+            await asyncio.wait(pending, timeout=remaining)
+
+    async def aclose(self, grace=1.0):
+        """Cancel the scope and return the tasks that ignored it and still run after grace seconds."""
+        self.cancel()
+        return await self.wait(grace)
+
+    def _deadline_reached(self):
+        self.deadline_reached = True
+        self.cancel(f"Cancel scope {self.name} reached its deadline")
+
+async def do_stuff(i):
+    try:
+        while True:
+            print(f"Do stuff {i}")
+            await asyncio.sleep(1)
+    except asyncio.CancelledError:
+        print(f"Do stuff {i} cancelled")
+        raise
+
+async def stubborn():
+    try:
+        await asyncio.sleep(3600)
+    except asyncio.CancelledError:
+        print("Stubborn task ignores the cancel")
+        await asyncio.sleep(0.5)  # Keeps running longer than the grace period
+
+async def failing():
+    await asyncio.sleep(0.1)
+    raise ValueError("Bad input")
+
+async def my_task():
+    print("Starting my_task")
+    async with CancelScope(name="my_task"):
+        # Nested scope, inherits the 0.5s deadline of the outer scope
+        async with CancelScope(timeout=10, name="inner") as inner:
+            for i in range(2):
+                inner.spawn(do_stuff(i))
+            await asyncio.sleep(3600)
+
+async def spawn_tree(depth, width):
+    if depth == 0:
+        await asyncio.sleep(3600)
+        return
+    async with CancelScope(name=f"level {depth}") as child:
+        for _ in range(width):
+            child.spawn(spawn_tree(depth - 1, width))
+
+async def main():
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        async with CancelScope(timeout=0.5, name="main"):
+            await my_task()
+    except TimeoutError:
+        print(f"my_task timed out after {loop.time() - start:.1f}s")
+
+    # A failing task cancels the other tasks in the scope, and its error is raised from "async with"
+    try:
+        async with CancelScope(name="failing") as scope:
+            scope.spawn(do_stuff(2))
+            scope.spawn(failing())
+            await asyncio.sleep(3600)
+    except* ValueError as group:
+        print(f"Scope failed: {group.exceptions!r}")
+
+    # A scope can also be used without "async with", then nothing waits for its tasks by itself
+    scope = CancelScope(name="stubborn")
+    scope.spawn(stubborn(), name="stubborn")
+    await asyncio.sleep(0.1)
+    ignored = await scope.aclose(grace=0.2)
+    print(f"Tasks that ignored cancellation: {[task.get_name() for task in ignored]}")
+
+    # A big tree, 1 + 100 + 100 * 100 tasks
+    root = CancelScope(name="root")
+    root.spawn(spawn_tree(2, 100))
+    while len(root.all_tasks()) < 10101:
+        await asyncio.sleep(0)
+    start = time.perf_counter()
+    count = len(root.all_tasks())
+    await root.aclose()
+    print(f"Cancelled {count} tasks in 3 levels in {time.perf_counter() - start:.3f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,193 @@
+"""
+This demo shows how to wait for a flag that is set from another thread or a signal handler without
+blocking the event loop. event_thread_type.py shows the problem: THREAD_QUIT.wait(timeout=30) is a
+threading.Event and blocks the whole loop, so the workers never get to run.
+
+BridgedEvent can be set from any thread or signal handler, waited for by threads with wait() and
+awaited from any number of event loops with wait_async(). Each event loop gets one self-pipe, shared
+by all BridgedEvents, that is registered on the loop with add_reader(). set() puts the event in a
+queue of every loop and writes one byte to its pipe, which wakes up the loop immediately (no
+polling). The loop then wakes up the coroutines waiting for the events in the queue, also when the
+event was cleared again before the loop got to it, like asyncio.Event does. There is no helper
+thread, neither per event nor per loop. deque.append() and os.write() are safe to call from a
+signal handler.
+
+Printout:
+    Worker 1 started.
+    Worker 2 started.
+    Start mainloop
+    Other loop waiting in thread 140411983656640
+    Worker 1 ended.
+    Worker 2 ended.
+    Setter thread sets THREAD_QUIT
+    Other loop woke up
+    Exit mainloop
+    Exit program
+"""
+
+import asyncio
+import collections
+import os
+import signal
+import threading
+import weakref
+
+class _LoopWaker:
+    """One self-pipe per event loop, shared by all BridgedEvents that are awaited in that loop."""
+
+    _wakers = weakref.WeakKeyDictionary()  # loop -> _LoopWaker
+    _all = ()  # The same wakers, only replaced under the lock, so set() can loop over it without the lock
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_loop(cls, loop):
+        with cls._lock:
+            waker = cls._wakers.get(loop)
+            if waker is None:
+                waker = cls._wakers[loop] = cls(loop)
+                cls._all = tuple(w for w in cls._all if w.alive()) + (waker,)
+            return waker
+
+    @classmethod
+    def wake_all(cls, event):
+        # Called from set(), which may run in a signal handler, so do not take the lock
+        for waker in cls._all:
+            waker.wake(event)
+
+    def __init__(self, loop):
+        # Only a weak reference, the waker must not keep the loop alive
+        self._loop = weakref.ref(loop)
+        self.waiters = {}  # BridgedEvent -> set of futures
+        self._pending = collections.deque()  # Events that were set, deque.append() is thread safe
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+        loop.add_reader(self._read_fd, self._on_readable)
+        self._finalizer = weakref.finalize(loop, _close_fds, self._read_fd, self._write_fd)
+
+    def alive(self):
+        loop = self._loop()
+        return loop is not None and not loop.is_closed()
+
+    def wake(self, event):
+        if not self.alive():
+            self._finalizer()  # Close the pipe now instead of when the loop is garbage collected
+            return
+        self._pending.append(event)
+        try:
+            os.write(self._write_fd, b"\0")
+        except (BlockingIOError, OSError):
+            pass  # The pipe is full (the loop will wake up anyway) or already closed
+
+    def _on_readable(self):
+        try:
+            while os.read(self._read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self._pending:
+            for fut in self.waiters.get(self._pending.popleft(), ()):
+                if not fut.done():
+                    fut.set_result(True)
+
+def _close_fds(*fds):
+    for fd in fds:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+class BridgedEvent:
+
+    def __init__(self):
+        self._flag = False
+        self._thread_event = threading.Event()  # For threads that call wait()
+
+    def is_set(self):
+        return self._flag
+
+    def set(self):
+        """Can be called from any thread and from signal handlers."""
+        self._flag = True
+        _LoopWaker.wake_all(self)
+        self._thread_event.set()
+
+    def clear(self):
+        self._flag = False
+        self._thread_event.clear()
+
+    def wait(self, timeout=None):
+        """Blocking wait, for threads. Never call this from a coroutine."""
+        return self._thread_event.wait(timeout)
+
+    async def wait_async(self):
+        if self._flag:
+            return True
+        loop = asyncio.get_running_loop()
+        waker = _LoopWaker.for_loop(loop)
+        fut = loop.create_future()
+        futures = waker.waiters.setdefault(self, set())
+        futures.add(fut)
+        try:
+            # set() may have been called while registering, then no wakeup will come for us
+            if self._flag:
+                return True
+            return await fut
+        finally:
+            futures.discard(fut)
+            if not futures:
+                waker.waiters.pop(self, None)
+
+THREAD_QUIT = BridgedEvent()  # Flag to tell whole app to quit
+
+def sig_handler(signum, _frame):
+    """Signal handler"""
+    THREAD_QUIT.set()
+    print(f"[app] sig_handler: got signal ctrl+c - terminating!")
+
+def setter_thread():
+    # Stands in for ctrl+c, so the demo ends by itself
+    threading.Event().wait(3)
+    print("Setter thread sets THREAD_QUIT")
+    THREAD_QUIT.set()
+
+def other_loop_thread():
+    async def wait_for_quit():
+        print(f"Other loop waiting in thread {threading.get_ident()}")
+        await THREAD_QUIT.wait_async()
+        print("Other loop woke up")
+    asyncio.run(wait_for_quit())
+
+async def worker(n):
+    print(f"Worker {n} started.")
+    await asyncio.sleep(2)
+    print(f"Worker {n} ended.")
+
+async def mainloop():
+    print("Start mainloop")
+    await THREAD_QUIT.wait_async()  # Does not block the loop, the workers keep running
+    print("Exit mainloop")
+
+async def main():
+    # setup signal handler
+    signal.signal(signal.SIGINT, sig_handler)  # Keyboard: Ctrl-C
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    workers = []
+    workers.append(asyncio.create_task(worker(1)))
+    workers.append(asyncio.create_task(worker(2)))
+
+    other = threading.Thread(target=other_loop_thread)
+    threading.Thread(target=setter_thread, daemon=True).start()
+
+    ml = asyncio.create_task(mainloop())
+    other.start()
+    await asyncio.gather(ml)
+    await asyncio.to_thread(other.join)
+    for task in workers:
+        task.cancel()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
+    print("Exit program")
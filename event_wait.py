@@ -0,0 +1,106 @@
+"""
+This demo shows a cheaper way to wait for an event with a timeout than the event_wait() helper in
+event.py and event_with_asyncio_signal_handler.py.
+
+That helper calls asyncio.wait_for(evt.wait(), timeout) every time. Each call creates a new
+coroutine (evt.wait()), a new task that runs it, a future, a timer and, when timing out, a
+TimeoutError that is raised and then suppressed.
+
+TimeoutEvent works like asyncio.Event, but its wait_timeout() puts one future directly in the set
+of waiters of the event and one timer handle on the loop, and nothing else. Whichever comes first,
+set() or the timer, gives the future its result (True or False), and no exception is raised.
+
+The benchmark starts 100k tasks that all wait at the same time, once with the event being set
+before the timeout and once with all of them timing out after 0.5s. The times include creating the
+tasks. The memory is the peak traced by tracemalloc divided by the number of waiters.
+
+Printout:
+    wait_for + asyncio.Event, set:       5.33s, 2736 bytes per waiter
+    TimeoutEvent.wait_timeout, set:      3.15s, 1473 bytes per waiter
+    wait_for + asyncio.Event, timeout:   8.83s, 3574 bytes per waiter
+    TimeoutEvent.wait_timeout, timeout:  3.34s, 1331 bytes per waiter
+"""
+
+import asyncio
+import contextlib
+import time
+import tracemalloc
+
+class TimeoutEvent:
+
+    def __init__(self):
+        self._waiters = set()
+        self._value = False
+
+    def is_set(self):
+        return self._value
+
+    def set(self):
+        if not self._value:
+            self._value = True
+            for fut in self._waiters:
+                if not fut.done():
+                    fut.set_result(True)
+
+    def clear(self):
+        self._value = False
+
+    async def wait(self):
+        return await self.wait_timeout(None)
+
+    async def wait_timeout(self, timeout):
+        """Wait until the event is set or timeout seconds have passed. Returns True if the event
+        is set and False on timeout, just like threading.Event.wait()."""
+        if self._value:
+            return True
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._waiters.add(fut)
+        timer = loop.call_later(timeout, _set_false, fut) if timeout is not None else None
+        try:
+            return await fut
+        finally:
+            self._waiters.discard(fut)
+            if timer is not None:
+                timer.cancel()
+
+def _set_false(fut):
+    if not fut.done():
+        fut.set_result(False)
+
+async def event_wait(evt: asyncio.Event, timeout: int):
+    """The helper from event.py"""
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(evt.wait(), timeout)
+    return evt.is_set()
+
+WAITERS = 100000
+
+async def run_waiters(event, wait, set_event, waiters):
+    tasks = [asyncio.create_task(wait(event)) for _ in range(waiters)]
+    await asyncio.sleep(0)  # Let all tasks start waiting
+    if set_event:
+        event.set()
+    results = await asyncio.gather(*tasks)
+    assert all(results) == set_event
+
+async def bench(name, make_event, wait, set_event):
+    start = time.perf_counter()
+    await run_waiters(make_event(), wait, set_event, WAITERS)
+    seconds = time.perf_counter() - start
+
+    # tracemalloc makes everything a lot slower, so measure the memory in a separate smaller run
+    tracemalloc.start()
+    await run_waiters(make_event(), wait, set_event, WAITERS // 10)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name + ', ' + ('set:' if set_event else 'timeout:'):<37}{seconds:.2f}s, "
+          f"{peak / (WAITERS // 10):.0f} bytes per waiter")
+
+async def main():
+    for set_event in (True, False):
+        await bench("wait_for + asyncio.Event", asyncio.Event, lambda evt: event_wait(evt, 0.5), set_event)
+        await bench("TimeoutEvent.wait_timeout", TimeoutEvent, lambda evt: evt.wait_timeout(0.5), set_event)
+
+if __name__ == "__main__":
+    asyncio.run(main())
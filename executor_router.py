@@ -0,0 +1,122 @@
+"""
+This demo shows how to let a decorator pick the executor, instead of choosing between the default
+pool, a ThreadPoolExecutor and a ProcessPoolExecutor by hand as in threads_types.py.
+
+A function decorated with @ROUTER.route("io") always runs in the persistent thread pool and a
+function decorated with @ROUTER.route("cpu") always runs in the persistent process pool. The caller
+just awaits the function.
+
+If no kind is given (@ROUTER.route()) the function is classified by measuring it. The first calls
+run in the thread pool and measure how much CPU time the thread used compared to the wall time of
+the call. A thread that sleeps or waits for I/O releases the GIL and uses almost no CPU time, a
+thread that computes in Python holds the GIL all the time. If the CPU time is more than cpu_ratio of
+the wall time the function is CPU-bound and all later calls go to the process pool. This keeps
+CPU-bound work from starving the thread pool and I/O work from paying the pickling cost of the
+process pool.
+
+Printout:
+    Main thread 140173084481344
+    In thread 140173065537088
+    blocking_io result: 100 bytes
+    In thread 140173065537088
+    cpu_bound result: 333332833333500000
+    In thread 140173084481344
+    cpu_bound result: 333332833333500000
+    blocking_io routed to thread pool
+    cpu_bound routed to process pool
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import sys
+import threading
+import time
+
+class ExecutorRouter:
+
+    def __init__(self, io_workers=None, cpu_workers=None, cpu_ratio=0.5, samples=1):
+        self.cpu_ratio = cpu_ratio
+        self.samples = samples
+        self.io_pool = concurrent.futures.ThreadPoolExecutor(io_workers)
+        self.cpu_pool = concurrent.futures.ProcessPoolExecutor(cpu_workers)
+        self.kinds = {}  # function name -> "io" or "cpu" once known
+
+    def route(self, kind=None):
+        """Decorator that makes a sync function awaitable and runs it in the right pool."""
+        def decorator(func):
+            name = func.__qualname__
+            measured = []  # CPU time / wall time of the calls made so far
+            if kind is not None:
+                self.kinds[name] = kind
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                loop = asyncio.get_running_loop()
+                call_kind = self.kinds.get(name)
+                if call_kind == "cpu":
+                    # The wrapper cannot be pickled, so the process looks up the original function
+                    job = functools.partial(_call_wrapped, func.__module__, name, args, kwargs)
+                    return await loop.run_in_executor(self.cpu_pool, job)
+                if call_kind == "io":
+                    return await loop.run_in_executor(self.io_pool, functools.partial(func, *args, **kwargs))
+
+                # Unknown kind, run in a thread and measure
+                ratio, result = await loop.run_in_executor(
+                    self.io_pool, functools.partial(_measure, func, args, kwargs))
+                measured.append(ratio)
+                if len(measured) >= self.samples:
+                    self.kinds[name] = "cpu" if sum(measured) / len(measured) > self.cpu_ratio else "io"
+                return result
+            return wrapper
+        return decorator
+
+    def shutdown(self):
+        self.io_pool.shutdown()
+        self.cpu_pool.shutdown()
+
+def _measure(func, args, kwargs):
+    # Runs in a worker thread. thread_time() only counts CPU time used by this thread.
+    wall, cpu = time.perf_counter(), time.thread_time()
+    result = func(*args, **kwargs)
+    wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+    return (cpu / wall if wall > 0 else 0.0), result
+
+def _call_wrapped(module, qualname, args, kwargs):
+    # Runs in a worker process
+    func = sys.modules[module]
+    for attr in qualname.split("."):
+        func = getattr(func, attr)
+    return func.__wrapped__(*args, **kwargs)
+
+ROUTER = ExecutorRouter()
+
+@ROUTER.route()
+def blocking_io():
+    print(f"In thread {threading.get_ident()}")
+    time.sleep(0.5)
+    with open('/dev/urandom', 'rb') as f:
+        return f.read(100)
+
+@ROUTER.route()
+def cpu_bound(n=10 ** 6):
+    print(f"In thread {threading.get_ident()}")
+    return sum(i * i for i in range(n))
+
+async def main():
+    print(f"Main thread {threading.get_ident()}")
+
+    # First calls are measured in the thread pool
+    print(f"blocking_io result: {len(await blocking_io())} bytes")
+    print(f"cpu_bound result: {await cpu_bound()}")
+
+    # Now cpu_bound is known to be CPU-bound and runs in the process pool
+    print(f"cpu_bound result: {await cpu_bound()}")
+
+    for name, kind in ROUTER.kinds.items():
+        print(f"{name} routed to {'process' if kind == 'cpu' else 'thread'} pool")
+
+    ROUTER.shutdown()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+This demo shows a decorator that caches the results of a coroutine function, using get_name() from
+callback.py as the expensive lookup.
+
+@single_flight(ttl, max_size) does three things:
+    - Concurrent calls with the same arguments share one task (single-flight). Only the first call
+      runs get_name(), the others await the same task (coalesced).
+    - The result is cached for ttl seconds. At most max_size results are kept, the least recently
+      used one is thrown out first (LRU). Exceptions are not cached.
+    - A caller that is cancelled does not cancel the shared task, because the callers await it
+      through asyncio.shield(). The other callers still get the result.
+The counters for hits, misses and coalesced calls are in get_name.stats.
+
+Printout:
+    get_name started for Kalle
+    Caller 2 was cancelled
+    Caller 0 got Kalle
+    Caller 1 got Kalle
+    Caller 3 got Kalle
+    Caller 4 got Kalle
+    Cached: Kalle
+    get_name started for Kalle
+    After ttl: Kalle
+    {'hits': 1, 'misses': 2, 'coalesced': 4}
+"""
+
+import asyncio
+import collections
+import functools
+
+def single_flight(ttl=60.0, max_size=128):
+    def decorator(func):
+        cache = collections.OrderedDict()  # key -> (expire time, result), least recently used first
+        in_flight = {}  # key -> task
+        stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+        def store(key, task):
+            del in_flight[key]
+            if task.cancelled() or task.exception() is not None:
+                return
+            cache[key] = (asyncio.get_running_loop().time() + ttl, task.result())
+            cache.move_to_end(key)
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            entry = cache.get(key)
+            if entry is not None:
+                if entry[0] > asyncio.get_running_loop().time():
+                    stats["hits"] += 1
+                    cache.move_to_end(key)
+                    return entry[1]
+                del cache[key]
+
+            task = in_flight.get(key)
+            if task is None:
+                stats["misses"] += 1
+                task = in_flight[key] = asyncio.create_task(func(*args, **kwargs))
+                task.add_done_callback(functools.partial(store, key))
+            else:
+                stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        wrapper.stats = stats
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+@single_flight(ttl=1, max_size=100)
+async def get_name(name="", sleep_time=3):
+    print(f"get_name started for {name}")
+    await asyncio.sleep(sleep_time)
+    return name
+
+async def caller(n):
+    try:
+        print(f"Caller {n} got {await get_name('Kalle', 0.5)}")
+    except asyncio.CancelledError:
+        print(f"Caller {n} was cancelled")
+
+async def main():
+    callers = [asyncio.create_task(caller(n)) for n in range(5)]
+    await asyncio.sleep(0.1)
+    callers[2].cancel()
+    await asyncio.gather(*callers)
+
+    print(f"Cached: {await get_name('Kalle', 0.5)}")
+
+    await asyncio.sleep(1)
+    print(f"After ttl: {await get_name('Kalle', 0.5)}")
+    print(get_name.stats)
+
+if __name__ == "__main__":
+    asyncio.run(main())
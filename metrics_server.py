@@ -0,0 +1,205 @@
+"""
+This demo shows a small HTTP server, only using asyncio and the standard library, that serves the
+health of the event loop in the Prometheus text format, so it can be scraped while the program runs.
+
+It serves:
+    asyncio_loop_lag_seconds                    - how late the loop ran a timer, last and max
+    asyncio_tasks{coroutine="..."}              - number of live tasks per coroutine name
+    asyncio_executor_queue_depth{executor=...}  - work items waiting for a worker
+    asyncio_executor_workers{executor=...}      - number of started worker threads/processes
+    asyncio_executor_active_workers{...}        - number of workers busy with a work item
+    asyncio_tasks_cancelled_total               - number of tasks that ended cancelled
+    asyncio_signals_handled_total{signal=...}   - number of signals handled
+
+The executors are the default executor of the loop and the ones registered with add_executor(),
+like the custom pools in threads_types.py. concurrent.futures has no public API for the queue
+depth, so it is read from the private attributes of the executors.
+Everything is computed on the loop from data that is already in memory, it's a few dict lookups
+and a walk over asyncio.all_tasks(), and the response is written with await writer.drain(), so a
+slow scraper does not block the loop.
+
+Printout:
+    Got SIGUSR1
+    HTTP/1.0 200 OK
+    Content-Type: text/plain; version=0.0.4
+    Content-Length: 966
+
+    # TYPE asyncio_loop_lag_seconds gauge
+    asyncio_loop_lag_seconds 0.000959
+    # TYPE asyncio_loop_lag_max_seconds gauge
+    asyncio_loop_lag_max_seconds 0.001320
+    # TYPE asyncio_tasks gauge
+    asyncio_tasks{coroutine="Metrics._handle"} 1
+    asyncio_tasks{coroutine="Metrics._lag_monitor"} 1
+    asyncio_tasks{coroutine="main"} 1
+    asyncio_tasks{coroutine="worker"} 6
+    # TYPE asyncio_executor_queue_depth gauge
+    asyncio_executor_queue_depth{executor="custom_threads"} 3
+    asyncio_executor_queue_depth{executor="default"} 0
+    # TYPE asyncio_executor_workers gauge
+    asyncio_executor_workers{executor="custom_threads"} 2
+    asyncio_executor_workers{executor="default"} 1
+    # TYPE asyncio_executor_active_workers gauge
+    asyncio_executor_active_workers{executor="custom_threads"} 2
+    asyncio_executor_active_workers{executor="default"} 1
+    # TYPE asyncio_tasks_cancelled_total counter
+    asyncio_tasks_cancelled_total 3
+    # TYPE asyncio_signals_handled_total counter
+    asyncio_signals_handled_total{signal="SIGUSR1"} 1
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import os
+import signal
+import time
+
+class Metrics:
+
+    def __init__(self, lag_interval=0.1):
+        self.lag_interval = lag_interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.cancelled = 0
+        self.signals = collections.Counter()
+        self.executors = {}  # name -> executor
+        self.server = None
+        self._loop = None
+        self._monitor = None
+        self._previous_factory = None
+
+    async def start(self, host="127.0.0.1", port=8000):
+        self._loop = asyncio.get_running_loop()
+        # Chain to a task factory that is already set (like the one of task_profiler.py)
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        self._monitor = asyncio.create_task(self._lag_monitor())
+        self.server = await asyncio.start_server(self._handle, host, port)
+
+    def add_executor(self, name, executor):
+        self.executors[name] = executor
+
+    def add_signal_handler(self, sig, callback, *args):
+        """Like loop.add_signal_handler(), but counts the signals."""
+        def handler():
+            self.signals[sig.name] += 1
+            callback(*args)
+        self._loop.add_signal_handler(sig, handler)
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        if task.cancelled():
+            self.cancelled += 1
+
+    async def _lag_monitor(self):
+        while True:
+            expected = self._loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.lag = max(self._loop.time() - expected, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+
+    def render(self):
+        lines = [
+            "# TYPE asyncio_loop_lag_seconds gauge",
+            f"asyncio_loop_lag_seconds {self.lag:.6f}",
+            "# TYPE asyncio_loop_lag_max_seconds gauge",
+            f"asyncio_loop_lag_max_seconds {self.max_lag:.6f}",
+            "# TYPE asyncio_tasks gauge",
+        ]
+        tasks = collections.Counter(getattr(task.get_coro(), "__qualname__", "unknown")
+                                    for task in asyncio.all_tasks(self._loop))
+        lines += [f'asyncio_tasks{{coroutine="{name}"}} {count}' for name, count in sorted(tasks.items())]
+
+        executors = dict(self.executors)
+        if getattr(self._loop, "_default_executor", None) is not None:
+            executors["default"] = self._loop._default_executor
+        stats = {name: executor_stats(executor) for name, executor in sorted(executors.items())}
+        # All samples of a metric must come together, after its TYPE line
+        for index, metric in enumerate(("queue_depth", "workers", "active_workers")):
+            lines.append(f"# TYPE asyncio_executor_{metric} gauge")
+            lines += [f'asyncio_executor_{metric}{{executor="{name}"}} {values[index]}'
+                      for name, values in stats.items()]
+
+        lines += ["# TYPE asyncio_tasks_cancelled_total counter",
+                  f"asyncio_tasks_cancelled_total {self.cancelled}",
+                  "# TYPE asyncio_signals_handled_total counter"]
+        lines += [f'asyncio_signals_handled_total{{signal="{name}"}} {count}'
+                  for name, count in sorted(self.signals.items())]
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():  # Skip the headers
+                pass
+            if request.split()[1:2] == [b"/metrics"]:
+                body = self.render().encode()
+                header = "HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            else:
+                body = b"Not found\n"
+                header = "HTTP/1.0 404 Not Found\r\nContent-Type: text/plain\r\n"
+            writer.write(f"{header}Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+def executor_stats(executor):
+    """Returns (queued work items, workers, active workers) of a concurrent.futures executor."""
+    if isinstance(executor, concurrent.futures.ThreadPoolExecutor):
+        workers = len(executor._threads)
+        idle = executor._idle_semaphore._value
+        return executor._work_queue.qsize(), workers, max(workers - idle, 0)
+    if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        pending = len(executor._pending_work_items)
+        workers = len(executor._processes or {})
+        return max(pending - workers, 0), workers, min(pending, workers)
+    return 0, 0, 0
+
+def blocking_io():
+    time.sleep(0.5)
+
+async def worker(loop, pool):
+    await loop.run_in_executor(pool, blocking_io)
+
+async def forever():
+    await asyncio.sleep(3600)
+
+async def scrape(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.0\r\n\r\n")
+    response = await reader.read()
+    writer.close()
+    return response.decode()
+
+async def main():
+    loop = asyncio.get_running_loop()
+    metrics = Metrics()
+    await metrics.start(port=8000)
+    metrics.add_signal_handler(signal.SIGUSR1, print, "Got SIGUSR1")
+
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    metrics.add_executor("custom_threads", pool)
+
+    for _ in range(3):
+        asyncio.create_task(forever()).cancel()
+    workers = [asyncio.create_task(worker(loop, pool)) for _ in range(5)]
+    workers.append(asyncio.create_task(worker(loop, None)))
+    os.kill(os.getpid(), signal.SIGUSR1)
+    await asyncio.sleep(0.3)
+
+    print(await scrape(8000))
+
+    await asyncio.gather(*workers)
+    pool.shutdown()
+    metrics.server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+This demo shows how to send many small blocking calls to a thread pool in batches.
+
+threads_compare.py sends every sleeper() call to the executor by itself. For calls that only take
+some microseconds that is mostly overhead: every run_in_executor() creates two futures, puts a work
+item in the queue of the pool, wakes up a worker thread, and wakes up the loop again through its
+self-pipe when the call is done.
+
+BatchExecutor.submit() is awaited like run_in_executor(), but the calls are collected until there
+are max_items of them or max_delay_us microseconds have passed since the first one. Then the whole
+batch is run by one worker thread, and the results (or exceptions) are set on the futures of the
+callers when the batch is done. A batch costs one handoff to the pool and back instead of one per
+call, but the calls in a batch run one after the other, and the first call of a batch waits up to
+max_delay_us before it even starts. So batching wins for many short calls, and loses for few or
+long calls, when the calls would rather run at the same time in different threads.
+
+With max_delay_us=0 there is no timer, a batch is all calls made until the loop gets to its next
+round of callbacks, which is often all that is needed when many tasks call at the same time. Note
+that the loop waits for timers in whole milliseconds (epoll), so a delay of 200 microseconds is
+really about 1 ms when nothing else wakes up the loop.
+
+The benchmark runs the given number of concurrent callers, each doing calls in a loop, with
+different lengths of the blocking work (time.sleep(), or nothing at all for 0), one submit per call
+against batches, and shows where one becomes faster than the other:
+    python micro_batch.py [--calls 20000]
+
+Printout (calls per second, on a machine with one CPU):
+    work us  callers  per call/s     T=0/s  T=200us/s  fastest
+          0        1       14451     11105        757  per call
+          0       10       27302     88964       7525  T=0
+          0      100       36547    231319     234866  T=200us
+          0     1000       33830    186408     186652  T=200us
+         10        1        7091      6337        727  per call
+         10       10       20255     12270       4920  per call
+         10      100       23375     20610      21758  per call
+         10     1000       25000     56078      53602  T=0
+        100        1        4335      4001        638  per call
+        100       10       19092      5593       3271  per call
+        100      100       20150      9425       9352  per call
+        100     1000       16556     28426      26663  T=0
+"""
+
+import argparse
+import asyncio
+import time
+
+class BatchExecutor:
+
+    def __init__(self, executor=None, max_items=64, max_delay_us=200):
+        self.executor = executor
+        self.max_items = max_items
+        self.max_delay = max_delay_us / 1e6
+        self.batches = 0
+        self._items = []  # (future, func, args)
+        self._timer = None
+
+    def submit(self, func, *args):
+        """Returns a future with the result of func(*args), run in a batch with other calls."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._items.append((fut, func, args))
+        if len(self._items) >= self.max_items:
+            self.flush()
+        elif self._timer is None:
+            if self.max_delay:
+                self._timer = loop.call_later(self.max_delay, self.flush)
+            else:
+                # Only the calls made before the loop gets to its next round of callbacks
+                self._timer = loop.call_soon(self.flush)
+        return fut
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if not items:
+            return
+        self.batches += 1
+        calls = [(func, args) for _, func, args in items]
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(self.executor, _run_batch, calls).add_done_callback(
+            lambda batch: _fan_out(items, batch))
+
+def _run_batch(calls):
+    results = []
+    for func, args in calls:
+        try:
+            results.append((True, func(*args)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+def _fan_out(items, batch):
+    if batch.exception() is not None:  # Like the pool shut down, the calls never ran
+        results = [(False, batch.exception())] * len(items)
+    else:
+        results = batch.result()
+    for (fut, _, _), (ok, value) in zip(items, results):
+        if fut.done():  # The caller was cancelled
+            continue
+        if ok:
+            fut.set_result(value)
+        else:
+            fut.set_exception(value)
+
+def sleeper(time_to_sleep):
+    if time_to_sleep:
+        time.sleep(time_to_sleep)
+    return time_to_sleep
+
+async def caller(call, calls, work):
+    for _ in range(calls):
+        await call(sleeper, work)
+
+async def calls_per_second(call, callers, total, work):
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(call, total // callers, work) for _ in range(callers)))
+    return total / (time.perf_counter() - start)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+    loop = asyncio.get_running_loop()
+
+    def per_call(func, *args):
+        return loop.run_in_executor(None, func, *args)
+
+    print(f"{'work us':>7}{'callers':>9}{'per call/s':>12}{'T=0/s':>10}{'T=200us/s':>11}  fastest")
+    for work_us in (0, 10, 100):
+        for callers in (1, 10, 100, 1000):
+            # Fewer calls when each call has to wait for the one before it
+            total = args.calls // 10 if callers == 1 else args.calls
+            rates = {
+                "per call": await calls_per_second(per_call, callers, total, work_us / 1e6),
+                "T=0": await calls_per_second(BatchExecutor(max_delay_us=0).submit, callers, total, work_us / 1e6),
+                "T=200us": await calls_per_second(BatchExecutor().submit, callers, total, work_us / 1e6),
+            }
+            fastest = max(rates, key=rates.get)
+            print(f"{work_us:>7}{callers:>9}{rates['per call']:>12.0f}{rates['T=0']:>10.0f}"
+                  f"{rates['T=200us']:>11.0f}  {fastest}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+This demo shows how to split a CPU-bound reduction over all cores, instead of computing it as one
+serial generator in one worker process like cpu_bound() in threads_types.py does.
+
+parallel_reduce() splits a range or a sequence into one chunk per core, runs the kernel on every
+chunk in a process pool and combines the partial results. A range is split into smaller ranges,
+so only three numbers per chunk are pickled and sent to the worker, not the numbers themselves.
+The whole thing is one awaitable, so the event loop keeps running while the cores are busy.
+
+The kernel sum_of_squares() uses NumPy if it is installed and falls back to pure Python if it is
+not. NumPy computes the squares in C, one block at a time. The size of the blocks is chosen from
+the largest number in the chunk, so that the sum of a block fits in an int64, and the block sums are
+added as Python ints so the total cannot overflow. Numbers too large for that (above about 3e9, so
+even their square does not fit) are summed as Python ints. Floats are summed by NumPy as floats,
+anything else (like Fractions or Decimals) in pure Python, so the result is the same with or without
+NumPy (up to the rounding of floats).
+
+Printout (1 core, without NumPy, so there is nothing to gain here. With more cores the parallel
+time goes down with the number of cores):
+    Serial:   333333283333335000000 in 0.83s
+    Parallel: 333333283333335000000 in 0.93s (1 chunks)
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INT64_MAX = 2 ** 63 - 1
+BLOCK = 10 ** 4  # Most numbers in one NumPy block
+
+def _block_size(max_abs):
+    """Numbers per block so that the sum of their squares fits in an int64, 0 if not even one fits."""
+    if max_abs * max_abs > INT64_MAX:
+        return 0
+    return min(BLOCK, INT64_MAX // max(max_abs * max_abs, 1))
+
+def sum_of_squares(chunk):
+    if numpy is None or not len(chunk):
+        return sum(i * i for i in chunk)
+    if isinstance(chunk, range):
+        block = _block_size(max(abs(chunk[0]), abs(chunk[-1])))
+        if not block:
+            return sum(i * i for i in chunk)
+        total = 0
+        for i in range(0, len(chunk), block):
+            part = chunk[i:i + block]
+            values = numpy.arange(part.start, part.stop, part.step, dtype=numpy.int64)
+            total += int(numpy.dot(values, values))
+        return total
+    values = numpy.asarray(chunk)
+    if values.dtype.kind == "f":
+        return float(numpy.dot(values, values))
+    if values.dtype.kind not in "iu":  # Like ints too large for NumPy, they are Python objects then
+        return sum(i * i for i in chunk)
+    block = _block_size(max(int(values.max()), -int(values.min())))
+    if not block:
+        return sum(i * i for i in chunk)
+    # numpy.dot() sums in the type of the array, so smaller types would overflow
+    values = values.astype(numpy.int64)
+    return sum(int(numpy.dot(values[i:i + block], values[i:i + block])) for i in range(0, len(values), block))
+
+def split(data, chunks):
+    """Split a range or a sequence in at most chunks parts of (almost) the same size."""
+    if not len(data):
+        return []
+    size = -(-len(data) // chunks)  # Round up
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+async def parallel_reduce(pool, kernel, data, combine=sum, chunks=None):
+    """Run kernel on chunks of data in pool and return combine(list of kernel results).
+    Empty data gives combine([])."""
+    loop = asyncio.get_running_loop()
+    parts = split(data, chunks or os.cpu_count())
+    results = await asyncio.gather(*(loop.run_in_executor(pool, kernel, part) for part in parts))
+    return combine(results)
+
+def cpu_bound():
+    return sum(i * i for i in range(10 ** 7))
+
+async def main():
+    loop = asyncio.get_running_loop()
+    with concurrent.futures.ProcessPoolExecutor() as pool:
+        start = time.perf_counter()
+        result = await loop.run_in_executor(pool, cpu_bound)
+        print(f"Serial:   {result} in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        result = await parallel_reduce(pool, sum_of_squares, range(10 ** 7))
+        print(f"Parallel: {result} in {time.perf_counter() - start:.2f}s ({os.cpu_count()} chunks)")
+
+if __name__ == '__main__':
+    asyncio.run(main())
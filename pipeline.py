@@ -0,0 +1,247 @@
+"""
+This demo builds a real pipeline out of the sketch in threads_combined.py (step1, a sync step2 run
+in an executor and activity_forever consuming a queue).
+
+A Pipeline is a list of stages. A stage has a function, which can be async or sync (sync functions
+are run in the default executor so they don't block the loop), a number of workers and a bounded
+queue in front of it. When a queue is full, put() on it waits, so a slow stage slows down the
+stages before it instead of letting the queue grow forever (backpressure).
+
+A stage with batch_size > 1 gets a list of up to batch_size items instead of one item. A worker
+waits at most batch_timeout seconds for a batch to fill up after the first item came in, so a batch
+is never held back long when the input is slow. It returns a list of results, one per item.
+A function that returns None drops the item, and the result of the last stage is thrown away.
+
+When the function raises, on_error of the stage decides what happens:
+    stop  - the pipeline is stopped, all workers are cancelled and the exception is raised from
+            put() and join() (also from a put() that was waiting for room in the queue)
+    skip  - the item (or the whole batch) is counted as an error and the stage goes on with the next
+            one. join() raises an ExceptionGroup with the exceptions when all items are processed
+
+stats() returns the number of processed items, the throughput and the current queue depth of every
+stage. The bottleneck is the last stage that has a full queue in front of it, since every stage
+before it is just waiting for it (here step2, which sleeps 20ms per item in four threads).
+
+Printout:
+    step1: 108 items, 0 errors, 215.8 items/s, queue 10/10
+    step2: 96 items, 0 errors, 191.8 items/s, queue 8/10
+    store: 90 items, 0 errors, 179.8 items/s, queue 0/10
+    ...
+    Stored batch of 10 items, last 196
+    Pipeline done
+    step1: 200 items, 0 errors, 190.1 items/s, queue 0/10
+    step2: 200 items, 0 errors, 190.1 items/s, queue 0/10
+    store: 200 items, 0 errors, 190.1 items/s, queue 0/10
+    Skipped: 4 items failed in the pipeline (4 sub-exceptions)
+    Stopped: Can't handle item 4, after putting 7 items
+"""
+
+import asyncio
+import inspect
+import time
+
+_DONE = object()  # Put in a queue to tell a worker that there are no more items
+
+class Stage:
+
+    def __init__(self, name, func, workers=1, batch_size=1, batch_timeout=0.05, queue_size=100,
+                 on_error="stop"):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.on_error = on_error
+        self.processed = 0
+        self.errors = []
+        self.started = None
+        self._running = 0
+
+    async def call(self, arg):
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(arg)
+        return await asyncio.get_running_loop().run_in_executor(None, self.func, arg)
+
+    async def get_batch(self):
+        """Returns a list of items and if the end of the input was reached."""
+        item = await self.queue.get()
+        if item is _DONE:
+            return [], True
+        batch = [item]
+        end_time = asyncio.get_running_loop().time() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            timeout = end_time - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+class Pipeline:
+
+    def __init__(self, *stages: Stage):
+        self.stages = stages
+        self.error = None  # The exception that stopped the pipeline
+        self._tasks = []
+        self._failed = None
+
+    def start(self):
+        self._failed = asyncio.get_running_loop().create_future()
+        for index, stage in enumerate(self.stages):
+            stage.started = time.monotonic()
+            stage._running = stage.workers
+            for _ in range(stage.workers):
+                self._tasks.append(asyncio.create_task(self._worker(index)))
+
+    async def put(self, item):
+        """Put an item in the first stage. Waits if the first stage is full."""
+        queue = self.stages[0].queue
+        if self.error is None and not queue.full():
+            queue.put_nowait(item)
+        elif self.error is None:
+            # Wait for room in the queue, or for the pipeline to stop, whatever comes first
+            putter = asyncio.ensure_future(queue.put(item))
+            try:
+                await asyncio.wait({putter, self._failed}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                putter.cancel()
+        if self.error is not None:
+            raise self.error
+
+    async def join(self):
+        """Tell the pipeline that no more items will come and wait until all items are processed."""
+        for _ in range(self.stages[0].workers):
+            await self.put(_DONE)
+        await asyncio.wait(self._tasks)
+        if self.error is not None:
+            raise self.error
+        errors = [error for stage in self.stages for error in stage.errors]
+        if errors:
+            raise ExceptionGroup(f"{len(errors)} items failed in the pipeline", errors)
+
+    def _fail(self, error):
+        if self.error is not None:
+            return
+        self.error = error
+        self._failed.set_result(None)
+        for task in self._tasks:
+            if task is not asyncio.current_task():
+                task.cancel()
+
+    async def _worker(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        done = False
+        while not done:
+            if stage.batch_size > 1:
+                batch, done = await stage.get_batch()
+            else:
+                item = await stage.queue.get()
+                done = item is _DONE
+                batch = [] if done else [item]
+            if not batch:
+                continue
+            try:
+                results = await stage.call(batch) if stage.batch_size > 1 else [await stage.call(batch[0])]
+            except Exception as e:
+                if stage.on_error != "skip":
+                    self._fail(e)
+                    return
+                stage.errors += [e] * len(batch)
+                continue
+            stage.processed += len(results)
+            if next_stage is not None:
+                for result in results:
+                    if result is not None:
+                        await next_stage.queue.put(result)
+
+        # The last worker of a stage tells the workers of the next stage that there is no more input
+        stage._running -= 1
+        if stage._running == 0 and next_stage is not None:
+            for _ in range(next_stage.workers):
+                await next_stage.queue.put(_DONE)
+
+    def stats(self):
+        now = time.monotonic()
+        return [{
+            "stage": stage.name,
+            "processed": stage.processed,
+            "errors": len(stage.errors),
+            "throughput": stage.processed / (now - stage.started),
+            "queue_depth": stage.queue.qsize(),
+            "queue_size": stage.queue.maxsize,
+        } for stage in self.stages]
+
+def print_stats(pipeline: Pipeline):
+    for s in pipeline.stats():
+        print(f"{s['stage']}: {s['processed']} items, {s['errors']} errors, {s['throughput']:.1f} items/s, "
+              f"queue {s['queue_depth']}/{s['queue_size']}")
+
+async def step1(job):
+    await asyncio.sleep(0.001)
+    return job
+
+def step2(job):
+    # note: this is sync, not async, but it's executed in an own thread
+    time.sleep(0.02)
+    return job
+
+async def store(jobs):
+    await asyncio.sleep(0.01)
+    print(f"Stored batch of {len(jobs)} items, last {jobs[-1]}")
+    return jobs
+
+def picky(job):
+    if job % 5 == 4:
+        raise ValueError(f"Can't handle item {job}")
+    return job
+
+async def report(pipeline: Pipeline):
+    while True:
+        await asyncio.sleep(0.5)
+        print_stats(pipeline)
+
+async def main():
+    pipeline = Pipeline(
+        Stage("step1", step1, queue_size=10),
+        Stage("step2", step2, workers=4, queue_size=10),
+        Stage("store", store, batch_size=10, queue_size=10),
+    )
+    pipeline.start()
+    reporter = asyncio.create_task(report(pipeline))
+
+    for job in range(200):
+        await pipeline.put(job)
+    await pipeline.join()
+
+    reporter.cancel()
+    print("Pipeline done")
+    print_stats(pipeline)
+
+    # A stage that fails on every fifth item, first skipping the failed items, then stopping
+    pipeline = Pipeline(Stage("picky", picky, workers=2, queue_size=2, on_error="skip"))
+    pipeline.start()
+    for job in range(20):
+        await pipeline.put(job)
+    try:
+        await pipeline.join()
+    except ExceptionGroup as e:
+        print(f"Skipped: {e}")
+
+    pipeline = Pipeline(Stage("picky", picky, workers=2, queue_size=2))
+    pipeline.start()
+    try:
+        for job in range(20):
+            await pipeline.put(job)
+        await pipeline.join()
+    except ValueError as e:
+        print(f"Stopped: {e}, after putting {job} items")
+
+if __name__ == "__main__":
+    asyncio.run(main())
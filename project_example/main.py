@@ -1,19 +1,23 @@
 """
 Demo on how to exit task gracefully when pressing ctrl+c.
+The tasks are started by a Supervisor (see supervisor.py), which restarts Task3 each time it
+crashes instead of letting main continue with one task less.
 """
 
 import asyncio
 import signal
 
 from async_task import AsyncTask
+from supervisor import RestartIntensityError, Supervisor
 from task1 import Task1
 from task2 import Task2
+from task3 import Task3
 
-TASK_LIST = []
+SUPERVISOR = Supervisor(strategy="one_for_one", max_restarts=5, period=60)
 
 def signal_handler():
     print("Exit gracefully!!")
-    [task.close("Ctrl+c pressed") for task in TASK_LIST]
+    SUPERVISOR.close("Ctrl+c pressed")
 
 async def main():
     print('Main started')
@@ -22,18 +26,23 @@ async def main():
         asyncio.get_running_loop().add_signal_handler(getattr(signal, sig), signal_handler)
 
     task1: AsyncTask = Task1()
-    task1.set_task(asyncio.create_task(task1.run()))
-    TASK_LIST.append(task1)
+    SUPERVISOR.add(task1)
 
     task2: AsyncTask = Task2()
-    task2.set_task(asyncio.create_task(task2.run()))
-    TASK_LIST.append(task2)
-
-    for task in TASK_LIST:
-        try:
-            await task.get_task()
-        except asyncio.CancelledError:
-            pass
+    SUPERVISOR.add(task2)
+
+    task3: AsyncTask = Task3()
+    SUPERVISOR.add(task3)
+
+    # Blocks until all tasks are closed. Task3 crashes every third second, so the supervisor gives up
+    # after a while (more than max_restarts crashes within period seconds) if ctrl+c isn't pressed
+    try:
+        await SUPERVISOR.run()
+    except RestartIntensityError as e:
+        print(f"Supervisor gave up: {e}")
+
+    for stats in SUPERVISOR.stats():
+        print(f"{stats['task']} was restarted {stats['restarts']} times")
 
     print('Main done')
 
@@ -0,0 +1,131 @@
+"""
+Supervisor that restarts AsyncTasks that crash.
+
+Without a supervisor a task whose run() raises just dies, and main keeps waiting for the other
+tasks with one worker less. The supervisor starts the tasks and restarts a task when run() raises:
+    one_for_one  - only the crashed task is restarted
+    one_for_all  - all tasks are cancelled and restarted, for tasks that depend on each other
+A task that returns normally or is cancelled (closed) is not restarted.
+
+A restart is delayed by an exponential backoff with jitter, backoff * 2**(crashes - 1) seconds but
+at most max_backoff, multiplied by a random factor between 0.5 and 1. crashes is the number of
+crashes within the last period seconds, so a task that crashes once in a while is restarted
+quickly, and a task in a crash loop waits longer and longer instead of burning CPU. If there are
+more than max_restarts crashes within period seconds, the supervisor gives up, closes all tasks and
+run() raises RestartIntensityError.
+"""
+
+import asyncio
+import random
+import time
+
+from async_task import AsyncTask
+
+class RestartIntensityError(Exception):
+    pass
+
+class _Child:
+
+    def __init__(self, task: AsyncTask):
+        self.task = task
+        self.state = "stopped"  # running, waiting (for a restart), stopped
+        self.restarts = 0
+        self.started = 0.0
+        self.restart_handle = None
+
+class Supervisor:
+
+    def __init__(self, strategy="one_for_one", max_restarts=5, period=60.0, backoff=0.5, max_backoff=30.0):
+        self.strategy = strategy
+        self.max_restarts = max_restarts
+        self.period = period
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._children = []
+        self._crashes = []  # Times of the crashes within the last period
+        self._closing = False
+        self._error = None
+        self._done = asyncio.Event()
+
+    def add(self, task: AsyncTask):
+        """Add a task and start it."""
+        child = _Child(task)
+        self._children.append(child)
+        self._start(child)
+
+    async def run(self):
+        """Wait until all tasks are done. Raises RestartIntensityError if the supervisor gave up."""
+        if self._children:
+            await self._done.wait()
+        if self._error is not None:
+            raise self._error
+
+    def close(self, reason=""):
+        """Stop restarting and close all tasks."""
+        self._closing = True
+        for child in self._children:
+            if child.restart_handle is not None:
+                child.restart_handle.cancel()
+                child.restart_handle = None
+            if child.state == "running":
+                child.task.close(reason)
+            child.state = "stopped" if child.state == "waiting" else child.state
+        self._check_done()
+
+    def stats(self):
+        now = time.monotonic()
+        return [{
+            "task": type(child.task).__name__,
+            "state": child.state,
+            "restarts": child.restarts,
+            "uptime": round(now - child.started, 1) if child.state == "running" else 0.0,
+        } for child in self._children]
+
+    def _start(self, child: _Child):
+        child.restart_handle = None
+        child.state = "running"
+        child.started = time.monotonic()
+        task = asyncio.create_task(child.task.run())
+        child.task.set_task(task)
+        task.add_done_callback(lambda t: self._on_done(child, t))
+
+    def _on_done(self, child: _Child, task):
+        if task is not child.task.get_task() or child.state != "running":
+            return  # Cancelled by a one_for_all restart, and already waiting for the restart
+        crashed = not task.cancelled() and task.exception() is not None
+        if not crashed or self._closing:
+            child.state = "stopped"
+            self._check_done()
+            return
+
+        print(f"Supervisor: {type(child.task).__name__} crashed: {task.exception()!r}")
+        now = time.monotonic()
+        self._crashes = [t for t in self._crashes if now - t < self.period] + [now]
+        if len(self._crashes) > self.max_restarts:
+            self._error = RestartIntensityError(
+                f"{len(self._crashes)} crashes within {self.period}s, giving up")
+            child.state = "stopped"
+            self.close("Restart intensity exceeded")
+            return
+
+        delay = min(self.max_backoff, self.backoff * 2 ** (len(self._crashes) - 1))
+        delay *= random.uniform(0.5, 1.0)
+        restart = [child]
+        if self.strategy == "one_for_all":
+            # Tasks that already returned or were closed stay stopped
+            restart = [other for other in self._children
+                       if other is child or other.state in ("running", "waiting")]
+            for other in restart:
+                if other is not child and other.state == "running":
+                    other.state = "waiting"
+                    other.task.get_task().cancel("Restarting all tasks")
+        for other in restart:
+            if other.restart_handle is not None:
+                other.restart_handle.cancel()  # Already waiting for a restart, start it only once
+            other.state = "waiting"
+            other.restarts += 1
+            other.restart_handle = asyncio.get_running_loop().call_later(delay, self._start, other)
+
+    def _check_done(self):
+        if all(child.state == "stopped" for child in self._children):
+            self._done.set()
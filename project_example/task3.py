@@ -0,0 +1,16 @@
+import asyncio
+from async_task import AsyncTask
+
+class Task3(AsyncTask):
+    """A task that crashes every third second, to show how the Supervisor restarts it."""
+
+    async def run(self):
+        print("Running Task3")
+        for _ in range(3):
+            print('Task3 executing')
+            await asyncio.sleep(1)
+        raise RuntimeError("Task3 lost its connection")
+
+    def close(self, reason=""):
+        print(f"Closing Task3, reason: {reason}")
+        self.task.cancel()
@@ -0,0 +1,46 @@
+"""
+Memory-compact variant of AsyncTask, for when there is one task per device or connection and
+millions of them.
+
+AsyncTask instances have a __dict__, and the task attribute is added to it by set_task(). A
+CompactAsyncTask declares its attributes in __slots__ instead, so there is no __dict__, and a
+subclass that also uses __slots__ only stores its own attributes. The asyncio.Task is the big part
+(a task with its coroutine is more than 1 kB), so it is not created until start() is called, for
+the objects that actually have something to run. An object that is never started costs only a
+few bytes.
+
+Subclasses must declare __slots__ themselves (an empty tuple if they have no attributes), otherwise
+they get a __dict__ again.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+
+class CompactAsyncTask(ABC):
+
+    # _task is left unset until the object is started, so subclasses don't have to call
+    # super().__init__(), which saves a call per object
+    __slots__ = ("_task",)
+
+    def start(self):
+        """Create the asyncio.Task and start running, if not already started."""
+        if not self.is_started():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def set_task(self, task):
+        self._task = task
+
+    def get_task(self):
+        return getattr(self, "_task", None)
+
+    def is_started(self):
+        return hasattr(self, "_task")
+
+    @abstractmethod
+    async def run(self):
+        pass
+
+    async def close(self, reason=""):
+        if self.is_started():
+            self._task.cancel(reason)
@@ -5,6 +5,8 @@ is handy if you don't want to do the synchronous calls from the signal_handler t
 each task (and you probably don't want to do that if the closedown procedure is heavy).
 Here you just set the event in the signal_handler and then you gracefully shut down each task
 by asynchronous calls from the main task.
+All tasks are closed concurrently by the ShutdownCoordinator (see shutdown.py), so the time from
+ctrl+c to exit is the time of the slowest close instead of the sum of all of them.
 """
 
 import asyncio
@@ -12,11 +14,12 @@ import contextlib
 import signal
 
 from async_task import AsyncTask
+from shutdown import ShutdownCoordinator
 from task1 import Task1
 from task2 import Task2
 
 QUIT: asyncio.Event = asyncio.Event()
-TASK_LIST = []
+SHUTDOWN = ShutdownCoordinator(deadline=10, task_timeout=5)
 
 def signal_handler():
     print(f"\nsig_handler: got signal ctrl+c - Exit gracefully!!")
@@ -31,26 +34,22 @@ async def main():
 
     task1: AsyncTask = Task1()
     task1.set_task(asyncio.create_task(task1.run()))
-    TASK_LIST.append(task1)
+    SHUTDOWN.register(task1)
 
     task2: AsyncTask = Task2()
     task2.set_task(asyncio.create_task(task2.run()))
-    TASK_LIST.append(task2)
+    SHUTDOWN.register(task2, phase=1)  # Closed after all phase 0 tasks are done
 
     # Block until we exit
     while not QUIT.is_set():
         with contextlib.suppress(asyncio.TimeoutError):  # Ignore TimeoutError
             await asyncio.wait_for(QUIT.wait(), 10)
 
-    # Close all tasks
-    [await task.close("Ctrl+c pressed") for task in TASK_LIST]
-
+    # Close all tasks concurrently and wait for them to be closed
     print ("Waiting for all tasks to be closed...")
-    for task in TASK_LIST:
-        try:
-            await task.get_task()
-        except asyncio.CancelledError:
-            pass
+    for entry in await SHUTDOWN.shutdown("Ctrl+c pressed"):
+        error = f" (close() raised {entry['error']})" if entry["error"] else ""
+        print(f"{entry['task']} {entry['status']} in {entry['seconds']}s{error}")
 
     print('Main done')
 
@@ -0,0 +1,95 @@
+"""
+Benchmark of CompactAsyncTask (see compact_task.py) against AsyncTask.
+
+Creates a million Device objects with each base class and measures how fast they are created and
+torn down. The bytes per object are measured with tracemalloc on 100k objects, and include the
+address int and the slot in the list, which are the same for both. Then the tasks are started for
+1% of the objects, which is all CompactAsyncTask needs, and for all of them as in main.py, where
+every AsyncTask gets its asyncio.Task when it is created.
+
+Printout:
+    AsyncTask:         1000000 objects, 119 bytes each, created in 0.93s, torn down in 0.07s
+    CompactAsyncTask:  1000000 objects, 87 bytes each, created in 0.80s, torn down in 0.05s
+    AsyncTask,        100000 of 100000 started: 1532 bytes each
+    CompactAsyncTask, 1000 of 100000 started: 101 bytes each
+"""
+
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from async_task import AsyncTask
+from compact_task import CompactAsyncTask
+
+OBJECTS = 1000000
+MEASURED = 100000  # Number of objects when measuring memory
+
+class Device(AsyncTask):
+
+    def __init__(self, address):
+        self.address = address
+
+    async def run(self):
+        await asyncio.sleep(3600)
+
+    async def close(self, reason=""):
+        self.task.cancel(reason)
+
+class CompactDevice(CompactAsyncTask):
+
+    __slots__ = ("address",)
+
+    def __init__(self, address):
+        self.address = address
+
+    async def run(self):
+        await asyncio.sleep(3600)
+
+def measure(cls):
+    gc.collect()
+    start = time.perf_counter()
+    objects = [cls(address) for address in range(OBJECTS)]
+    created = time.perf_counter() - start
+    start = time.perf_counter()
+    del objects
+    torn_down = time.perf_counter() - start
+
+    # tracemalloc makes everything a lot slower, so measure the memory in a separate smaller run
+    tracemalloc.start()
+    objects = [cls(address) for address in range(MEASURED)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{cls.__base__.__name__ + ':':<19}{OBJECTS} objects, {size // MEASURED} bytes each, "
+          f"created in {created:.2f}s, torn down in {torn_down:.2f}s")
+
+async def measure_started(name, cls, start):
+    gc.collect()
+    tracemalloc.start()
+    objects = [cls(address) for address in range(MEASURED)]
+    started = start(objects)
+    await asyncio.sleep(0)  # Let the tasks start running
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name + ',':<18}{started} of {MEASURED} started: {size // MEASURED} bytes each")
+    for task in asyncio.all_tasks() - {asyncio.current_task()}:
+        task.cancel()
+    await asyncio.sleep(0)
+
+def start_all(objects):
+    for device in objects:
+        device.set_task(asyncio.create_task(device.run()))
+    return len(objects)
+
+def start_some(objects):
+    for device in objects[::100]:
+        device.start()
+    return len(objects[::100])
+
+async def main():
+    measure(Device)
+    measure(CompactDevice)
+    await measure_started("AsyncTask", Device, start_all)
+    await measure_started("CompactAsyncTask", CompactDevice, start_some)
+
+asyncio.run(main())
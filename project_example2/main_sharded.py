@@ -0,0 +1,53 @@
+"""
+Demo of running AsyncTasks in several processes with the ShardLauncher (see sharding.py).
+Exit with ctrl+c, which makes every shard close its tasks gracefully.
+
+Printout (2 shards):
+    Main started
+    Running Task1
+    Task1 executing
+    Running Task2
+    Task2 executing
+    ...
+    Shard 0 pid 9190: 3/3 tasks alive, loop lag 1.4 ms
+    Shard 1 pid 9191: 3/3 tasks alive, loop lag 1.4 ms
+    ...
+    ^CClosing Task2, reason: Shard stopped
+    Closing Task1, reason: Shard stopped
+    ...
+    Shard 0 closed 3 tasks, slowest in 0.0s
+    Shard 1 closed 3 tasks, slowest in 0.0s
+    Main done
+"""
+
+import asyncio
+
+from sharding import ShardLauncher, TaskSpec
+from task1 import Task1
+from task2 import Task2
+
+async def report(launcher: ShardLauncher):
+    while True:
+        await asyncio.sleep(5)
+        for shard, health in sorted(launcher.health.items()):
+            print(f"Shard {shard} pid {health['pid']}: {health['alive']}/{health['tasks']} tasks alive, "
+                  f"loop lag {health['loop_lag_ms']} ms")
+
+async def main():
+    print('Main started')
+    launcher = ShardLauncher(shards=2, placement="hash")
+    for device in range(3):
+        launcher.add(TaskSpec(Task1, key=f"device-{device}"))
+        launcher.add(TaskSpec(Task2, key=f"connection-{device}"))
+
+    reporter = asyncio.create_task(report(launcher))
+    await launcher.run()  # Blocks until all shards have exited
+    reporter.cancel()
+
+    for shard, entries in sorted(launcher.reports.items()):
+        slowest = max((entry["seconds"] for entry in entries), default=0.0)
+        print(f"Shard {shard} closed {len(entries)} tasks, slowest in {slowest}s")
+    print('Main done')
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""
+Periodic AsyncTask backed by a hierarchical timing wheel.
+
+Task1.run and Task2.run loop on "await asyncio.sleep(1)", so every periodic task puts its own timer
+handle on the heap of the event loop. With 100k periodic tasks the loop spends its time pushing and
+popping that heap. Here all periodic tasks share one TimingWheel instead. The wheel only has one
+timer on the event loop, which fires once per tick, and wakes up all tasks that are due in that tick.
+Wakeups are thereby rounded up to whole ticks (coalesced), which is fine for periodic work.
+
+The wheel has a number of levels with the same number of slots in each. Level 0 holds everything
+due within slots ticks, level 1 everything due within slots**2 ticks and so on. When level 0 has
+gone around once, the next slot of level 1 is moved down (cascaded) to level 0. Adding and removing
+a wakeup is O(1) no matter how many are scheduled.
+
+A subclass of PeriodicTask implements execute(), which is called every interval seconds:
+    jitter        - every wakeup is moved a random time within +-jitter, to spread the load
+    skip_if_late  - if execute() took longer than the interval (or the loop was blocked), the
+                    missed runs are skipped instead of being run back to back to catch up
+"""
+
+import asyncio
+import math
+import random
+from abc import abstractmethod
+
+from async_task import AsyncTask
+
+class TimingWheel:
+
+    def __init__(self, tick=0.05, slots=256, levels=3):
+        self.tick = tick
+        self.slots = slots
+        self._wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._current = 0  # Number of ticks since start
+        self._start = None
+        self._pending = 0
+        self._timer = None
+
+    def wait(self, delay):
+        """Return a future that is done when delay seconds have passed, rounded up to whole ticks."""
+        loop = asyncio.get_running_loop()
+        if self._timer is None:
+            self._restart(loop)
+        fut = loop.create_future()
+        # The wheel time may lag a bit behind the loop time, so count from the loop time
+        expiry = math.ceil((loop.time() - self._start + delay) / self.tick)
+        self._add(expiry if expiry > self._current else self._current + 1, fut)
+        self._pending += 1
+        return fut
+
+    def _restart(self, loop):
+        # The wheel is empty, so just jump to the current time and start ticking
+        if self._start is None:
+            self._start = loop.time()
+        self._current = int((loop.time() - self._start) / self.tick)
+        self._schedule_tick(loop)
+
+    def _schedule_tick(self, loop):
+        self._timer = loop.call_at(self._start + (self._current + 1) * self.tick, self._on_tick, loop)
+
+    def _add(self, expiry, fut):
+        delta = expiry - self._current
+        if delta < self.slots:  # Fast path, almost all periodic wakeups end up here
+            self._wheels[0][expiry % self.slots].append((expiry, fut))
+            return
+        level = 1
+        while delta >= self.slots ** (level + 1) and level < len(self._wheels) - 1:
+            level += 1
+        self._wheels[level][(expiry // self.slots ** level) % self.slots].append((expiry, fut))
+
+    def _on_tick(self, loop):
+        # If the loop was blocked, catch up on all ticks that have passed
+        while self._start + (self._current + 1) * self.tick <= loop.time():
+            self._advance()
+        if self._pending:
+            self._schedule_tick(loop)
+        else:
+            self._timer = None
+
+    def _advance(self):
+        self._current += 1
+        # Move the next slot of the upper levels down when the level below has gone around
+        for level in range(len(self._wheels) - 1, 0, -1):
+            if self._current % self.slots ** level == 0:
+                index = (self._current // self.slots ** level) % self.slots
+                entries, self._wheels[level][index] = self._wheels[level][index], []
+                for expiry, fut in entries:
+                    self._add(expiry, fut)
+
+        index = self._current % self.slots
+        entries, self._wheels[0][index] = self._wheels[0][index], []
+        for _, fut in entries:
+            self._pending -= 1
+            if not fut.done():  # Done if the waiting task was cancelled
+                fut.set_result(None)
+
+class PeriodicTask(AsyncTask):
+
+    def __init__(self, wheel: TimingWheel, interval, jitter=0.0, skip_if_late=True):
+        self.wheel = wheel
+        self.interval = interval
+        self.jitter = jitter
+        self.skip_if_late = skip_if_late
+        self.runs = 0
+        self.skipped = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        while True:
+            await self.execute()
+            self.runs += 1
+
+            next_run += self.interval
+            delay = next_run - loop.time()
+            if delay < 0 and self.skip_if_late:
+                missed = math.ceil(-delay / self.interval)
+                self.skipped += missed
+                next_run += missed * self.interval
+                delay += missed * self.interval
+            if self.jitter:
+                delay += random.uniform(-self.jitter, self.jitter)
+            if delay > 0:
+                await self.wheel.wait(delay)
+            else:
+                await asyncio.sleep(0)  # Behind schedule, but still let the other tasks run
+
+    @abstractmethod
+    async def execute(self):
+        pass
+
+    async def close(self, reason=""):
+        self.task.cancel(reason)
@@ -0,0 +1,119 @@
+"""
+Run AsyncTasks in several processes, each with its own event loop, so more than one core is used.
+
+ShardLauncher starts one worker process (shard) per core. The tasks are given as TaskSpecs (the
+AsyncTask class, its arguments and a key) instead of instances, since every shard creates its own
+instances. A task is put in a shard by:
+    "hash"  - hash of the key, so the same key always ends up in the same shard
+    "load"  - the shard with the lowest total weight so far
+
+Every shard runs the same graceful close path as main.py: a SIGINT or SIGTERM sets QUIT and the
+tasks are closed by the ShutdownCoordinator. The launcher forwards SIGINT/SIGTERM that it gets to
+every shard. Each shard sends its health (pid, number of live tasks and loop lag) to the launcher
+every second through a pipe, and the shutdown report when it is done.
+"""
+
+import asyncio
+import collections
+import multiprocessing
+import os
+import signal
+import zlib
+
+from shutdown import ShutdownCoordinator
+
+TaskSpec = collections.namedtuple("TaskSpec", "cls args key weight", defaults=((), None, 1))
+
+class ShardLauncher:
+
+    def __init__(self, shards=None, placement="hash", health_interval=1.0):
+        self.shards = shards or os.cpu_count()
+        self.placement = placement
+        self.health_interval = health_interval
+        self.health = {}  # shard -> last health message
+        self.reports = {}  # shard -> shutdown report
+        self._specs = [[] for _ in range(self.shards)]
+        self._load = [0] * self.shards
+        self._processes = []
+
+    def add(self, spec: TaskSpec):
+        if self.placement == "hash":
+            # hash() of a str differs between processes, crc32 does not
+            shard = zlib.crc32(repr(spec.key).encode()) % self.shards
+        else:
+            shard = self._load.index(min(self._load))
+        self._specs[shard].append(spec)
+        self._load[shard] += spec.weight
+        return shard
+
+    async def run(self):
+        """Start the shards and wait until all of them have exited."""
+        loop = asyncio.get_running_loop()
+        ctx = multiprocessing.get_context("spawn")
+        for shard, specs in enumerate(self._specs):
+            receiver, sender = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_shard_main, args=(shard, specs, sender, self.health_interval),
+                                  name=f"shard-{shard}")
+            process.start()
+            sender.close()
+            loop.add_reader(receiver.fileno(), self._on_message, receiver)
+            self._processes.append((process, receiver))
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._forward_signal, sig)
+
+        for process, receiver in self._processes:
+            await asyncio.to_thread(process.join)
+        for process, receiver in self._processes:
+            loop.remove_reader(receiver.fileno())
+            receiver.close()
+
+    def _forward_signal(self, sig):
+        for process, _ in self._processes:
+            if process.is_alive():
+                os.kill(process.pid, sig)
+
+    def _on_message(self, receiver):
+        try:
+            kind, shard, data = receiver.recv()
+        except EOFError:
+            asyncio.get_running_loop().remove_reader(receiver.fileno())
+            return
+        if kind == "health":
+            self.health[shard] = data
+        else:
+            self.reports[shard] = data
+
+def _shard_main(shard, specs, sender, health_interval):
+    # Runs in the shard process
+    asyncio.run(_shard(shard, specs, sender, health_interval))
+    sender.close()
+
+async def _shard(shard, specs, sender, health_interval):
+    loop = asyncio.get_running_loop()
+    quit_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, quit_event.set)
+
+    coordinator = ShutdownCoordinator()
+    tasks = []
+    for spec in specs:
+        task = spec.cls(*spec.args)
+        task.set_task(asyncio.create_task(task.run()))
+        coordinator.register(task)
+        tasks.append(task)
+
+    while not quit_event.is_set():
+        expected = loop.time() + health_interval
+        try:
+            await asyncio.wait_for(quit_event.wait(), health_interval)
+        except asyncio.TimeoutError:
+            pass
+        sender.send(("health", shard, {
+            "pid": os.getpid(),
+            "tasks": len(tasks),
+            "alive": sum(not task.get_task().done() for task in tasks),
+            "loop_lag_ms": round(max(loop.time() - expected, 0.0) * 1000, 1),
+        }))
+
+    sender.send(("report", shard, await coordinator.shutdown("Shard stopped")))
@@ -0,0 +1,72 @@
+"""
+Shutdown coordinator for AsyncTask objects.
+
+Closing the tasks one by one, as in "[await task.close(...) for task in TASK_LIST]", makes the
+total shutdown time the sum of every close. The coordinator instead closes all tasks in the same
+phase concurrently, so a phase takes as long as its slowest task. Phases are run in order (lowest
+first), which makes it possible to stop e.g. producers before consumers.
+
+Every task has its own timeout and the whole shutdown has a global deadline. A task that has not
+finished when its time is up is force cancelled (task.cancel()) and given a short grace period to
+exit. The shutdown returns a report with how long each task took and how it ended:
+    closed  - the task exited by itself after close() was called
+    forced  - the task had to be force cancelled
+    stuck   - the task did not even exit after being force cancelled
+    error   - close() raised an exception, and the task exited by itself
+The exception raised by close() is in the "error" field of the entry (None if there was none), also
+when the task then had to be force cancelled and the status is forced or stuck.
+"""
+
+import asyncio
+
+from async_task import AsyncTask
+
+class ShutdownCoordinator:
+
+    def __init__(self, deadline=10.0, task_timeout=5.0, cancel_grace=1.0):
+        self.deadline = deadline
+        self.task_timeout = task_timeout
+        self.cancel_grace = cancel_grace
+        self._phases = {}  # phase -> list of (AsyncTask, timeout)
+
+    def register(self, task: AsyncTask, phase=0, timeout=None):
+        """Register a task to be closed in the given phase. Lower phases are closed first."""
+        self._phases.setdefault(phase, []).append((task, self.task_timeout if timeout is None else timeout))
+
+    async def shutdown(self, reason=""):
+        """Close all registered tasks and return a list with one report entry per task."""
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + self.deadline
+        report = []
+        for phase in sorted(self._phases):
+            results = await asyncio.gather(
+                *[self._drain(task, reason, timeout, end_time) for task, timeout in self._phases[phase]])
+            report.extend({"phase": phase, **result} for result in results)
+        return report
+
+    async def _drain(self, task: AsyncTask, reason, timeout, end_time):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        # The task must be done before its own timeout and before the global deadline
+        task_end = min(start + timeout, end_time)
+        status = "closed"
+        error = None
+
+        # close() may itself be slow, so run it as a task that can be abandoned
+        closer = asyncio.create_task(task.close(reason))
+        await asyncio.wait({closer}, timeout=max(task_end - loop.time(), 0))
+        if closer.done() and not closer.cancelled() and closer.exception() is not None:
+            status = "error"
+            error = repr(closer.exception())
+        elif not closer.done():
+            closer.cancel()
+
+        # Wait for the task itself to exit. asyncio.wait does not cancel the task on timeout.
+        done, _ = await asyncio.wait({task.get_task()}, timeout=max(task_end - loop.time(), 0))
+        if not done:
+            task.get_task().cancel("Shutdown timeout")
+            done, _ = await asyncio.wait({task.get_task()}, timeout=self.cancel_grace)
+            status = "forced" if done else "stuck"
+
+        return {"task": type(task).__name__, "status": status, "error": error,
+                "seconds": round(loop.time() - start, 3)}
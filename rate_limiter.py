@@ -0,0 +1,251 @@
+"""
+This demo shows rate limiters and a concurrency limiter for loops like Task1.run() in
+project_example, that are shared by many tasks.
+
+Task1.run() throttles itself with a fixed asyncio.sleep(1), which is too slow when nothing else is
+running and does nothing to stop a burst when many tasks call the same service.
+    TokenBucket         - await acquire(n) takes n tokens. The bucket holds at most capacity tokens
+                          and gets rate new tokens per second, so bursts up to capacity go right
+                          through and after that the calls are spread out at rate per second.
+                          Waiters are served first come first served, a waiter reserves its tokens
+                          and knows right away when it can run.
+    LeakyBucket         - a token bucket without bursts, calls are let through at an even rate.
+                          A call that would have to wait longer than queue_size calls raises
+                          asyncio.QueueFull, like a full queue
+    KeyedRateLimiter    - one token bucket per key (like one per user or host). Buckets that have
+                          not been used for idle_timeout are removed when new keys are added, so
+                          many short lived keys don't use up the memory
+    ConcurrencyLimiter  - "async with limiter.hold(weight)" lets through calls until the sum of
+                          their weights would be over limit. Also first come first served, so a
+                          heavy call is not kept waiting forever by a stream of light ones
+None of them polls. All waiting for tokens is done on a heap of (wake up time, future) with a
+single loop timer for the earliest one, that can be shared by all buckets, so thousands of
+waiters cost O(log n) each and not thousands of timers.
+
+Printout:
+    Worker 0 call 1 at 0.0s
+    Worker 1 call 1 at 0.0s
+    Worker 2 call 1 at 0.0s
+    Worker 0 call 2 at 0.0s
+    Worker 1 call 2 at 0.0s
+    Worker 2 call 2 at 0.2s
+    Worker 0 call 3 at 0.4s
+    Worker 1 call 3 at 0.6s
+    Worker 2 call 3 at 0.8s
+    Worker 0 call 4 at 1.0s
+    Worker 1 call 4 at 1.2s
+    Worker 2 call 4 at 1.4s
+    LeakyBucket: 11 calls let through, 89 rejected
+    ConcurrencyLimiter: 100 calls, max weight in flight 10 of 10
+    KeyedRateLimiter: 10000 calls on 1000 keys in 0.152s, 97 loop timers created
+    KeyedRateLimiter: 1000 keys before idle_timeout, 1 after
+"""
+
+import asyncio
+import collections
+import contextlib
+import heapq
+import itertools
+import time
+
+class TimerHeap:
+    """Futures that are done at a given loop time, all on one loop timer."""
+
+    def __init__(self):
+        self.timers_created = 0
+        self._heap = []  # (when, seq, future)
+        self._seq = itertools.count()
+        self._timer = None
+        self._timer_when = None
+
+    def wait_until(self, when):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        heapq.heappush(self._heap, (when, next(self._seq), fut))
+        if self._timer is None or when < self._timer_when:
+            self._set_timer(loop, when)
+        return fut
+
+    def _set_timer(self, loop, when):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._fire, loop)
+        self._timer_when = when
+        self.timers_created += 1
+
+    def _fire(self, loop):
+        # The loop runs timers a little early (its clock resolution), so go by the timer time
+        now = max(loop.time(), self._timer_when)
+        self._timer = None
+        heap = self._heap
+        while heap and (heap[0][0] <= now or heap[0][2].done()):
+            fut = heapq.heappop(heap)[2]
+            if not fut.done():  # Cancelled waiters are left in the heap until they come first
+                fut.set_result(None)
+        if heap:
+            self._set_timer(loop, heap[0][0])
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity, max_wait=None, timers=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.last_used = None
+        self._tokens = capacity  # Negative when waiters have reserved tokens not yet there
+        self._updated = None
+        self._timers = timers if timers is not None else TimerHeap()
+
+    def _refill(self, now):
+        if self._updated is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        if tokens > self.capacity:
+            raise ValueError(f"Can't take {tokens} tokens from a bucket of {self.capacity}")
+        now = asyncio.get_running_loop().time()
+        self._refill(now)
+        self.last_used = now
+        self._tokens -= tokens
+        if self._tokens >= 0:
+            return
+        delay = -self._tokens / self.rate
+        if self.max_wait is not None and delay > self.max_wait:
+            self._tokens += tokens
+            raise asyncio.QueueFull()
+        self.waiting += 1
+        try:
+            await self._timers.wait_until(now + delay)
+        except asyncio.CancelledError:
+            # Give the tokens back, the waiters after this one will still wake up at their time
+            self._tokens = min(self.capacity, self._tokens + tokens)
+            raise
+        finally:
+            self.waiting -= 1
+
+class LeakyBucket(TokenBucket):
+
+    def __init__(self, rate, queue_size, timers=None):
+        super().__init__(rate, capacity=1, max_wait=queue_size / rate, timers=timers)
+
+class KeyedRateLimiter:
+
+    def __init__(self, rate, capacity, idle_timeout=60.0):
+        self.rate = rate
+        self.capacity = capacity
+        # A removed key gets a full bucket the next time, so wait at least until it would be full
+        self.idle_timeout = max(idle_timeout, capacity / rate)
+        self.buckets = collections.OrderedDict()  # key -> TokenBucket, least recently used first
+        self.timers = TimerHeap()
+
+    def bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self._evict_idle()
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity, timers=self.timers)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    async def acquire(self, key, tokens=1):
+        await self.bucket(key).acquire(tokens)
+
+    def _evict_idle(self):
+        oldest = asyncio.get_running_loop().time() - self.idle_timeout
+        while self.buckets:
+            key, bucket = next(iter(self.buckets.items()))
+            if bucket.waiting or bucket.last_used is None or bucket.last_used > oldest:
+                return
+            del self.buckets[key]
+
+class ConcurrencyLimiter:
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters = collections.deque()  # (weight, future)
+
+    async def acquire(self, weight=1):
+        if weight > self.limit:
+            raise ValueError(f"Weight {weight} is over the limit {self.limit}")
+        if not self._waiters and self.in_use + weight <= self.limit:
+            self.in_use += weight
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((weight, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(weight)  # It got its turn just before it was cancelled
+            else:
+                self._wake()  # Waiters behind this one may fit now
+            raise
+
+    def release(self, weight=1):
+        self.in_use -= weight
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            weight, fut = self._waiters[0]
+            if fut.done():
+                self._waiters.popleft()
+                continue
+            if self.in_use + weight > self.limit:
+                return
+            self._waiters.popleft()
+            self.in_use += weight
+            fut.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, weight=1):
+        await self.acquire(weight)
+        try:
+            yield
+        finally:
+            self.release(weight)
+
+async def worker(i, bucket, start):
+    # Like Task1.run(), but throttled by a bucket shared with the other workers instead of sleep(1)
+    for call in range(1, 5):
+        await bucket.acquire()
+        print(f"Worker {i} call {call} at {time.monotonic() - start:.1f}s")
+        await asyncio.sleep(0.01)  # The call to the service
+
+async def weighted_call(limiter, weight, stats):
+    async with limiter.hold(weight):
+        stats["max"] = max(stats["max"], limiter.in_use)
+        await asyncio.sleep(0.001)
+
+async def main():
+    # 5 calls per second, in bursts of at most 5
+    bucket = TokenBucket(rate=5, capacity=5)
+    start = time.monotonic()
+    await asyncio.gather(*(worker(i, bucket, start) for i in range(3)))
+
+    leaky = LeakyBucket(rate=100, queue_size=10)
+    results = await asyncio.gather(*(leaky.acquire() for _ in range(100)), return_exceptions=True)
+    rejected = sum(isinstance(result, asyncio.QueueFull) for result in results)
+    print(f"LeakyBucket: {len(results) - rejected} calls let through, {rejected} rejected")
+
+    limiter = ConcurrencyLimiter(limit=10)
+    stats = {"max": 0}
+    await asyncio.gather(*(weighted_call(limiter, 1 + i % 4, stats) for i in range(100)))
+    print(f"ConcurrencyLimiter: 100 calls, max weight in flight {stats['max']} of {limiter.limit}")
+
+    # 10 calls on each of 1000 keys at 100 calls per second per key, 10000 waiters at the same time
+    keyed = KeyedRateLimiter(rate=100, capacity=1, idle_timeout=0.2)
+    start = time.monotonic()
+    await asyncio.gather(*(keyed.acquire(key) for _ in range(10) for key in range(1000)))
+    print(f"KeyedRateLimiter: 10000 calls on 1000 keys in {time.monotonic() - start:.3f}s, "
+          f"{keyed.timers.timers_created} loop timers created")
+    keys = len(keyed.buckets)
+    await asyncio.sleep(0.3)
+    await keyed.acquire("new key")
+    print(f"KeyedRateLimiter: {keys} keys before idle_timeout, {len(keyed.buckets)} after")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+"""
+This demo shows how to find out which task is eating the time of the event loop.
+
+TaskProfiler.install() sets a task factory on the loop, so every task created after that (with
+asyncio.create_task() or asyncio.gather() etc.) gets its coroutine wrapped in a ProfiledCoroutine.
+The event loop runs a task in steps, from one await that gives back the control to asyncio to the
+next one, by calling send() on the coroutine. The wrapper measures the time of every send(), which
+is the time the task held the event loop. The stats are summed per coroutine name:
+    tasks      - number of tasks that ran this coroutine
+    steps      - number of steps
+    total/max  - total and longest time of a step, in ms
+    lifetime   - total wall time from task creation until done, in ms
+    cancelled  - number of tasks that were cancelled
+and the same is kept per task, for the tasks that are running and the last keep_finished tasks
+that are done, so the memory used does not grow with the number of tasks. report() shows the top
+coroutines, report(per_task=True) the top tasks.
+The cost is two perf_counter() calls and a few additions per step, so it can be left on.
+
+If the loop already has a task factory (like the one of metrics_server.py or task_tracer.py), the
+profiler wraps the coroutine and passes it on to that factory, so both keep working.
+
+Printout:
+    coroutine        tasks   steps  total ms    max ms  lifetime ms  cancelled
+    my_work              1       3     200.4     100.2        201.1          0
+    do_stuff            10      30       0.2       0.1       3016.7          0
+    forever              1       4       0.1       0.1        302.0          1
+
+    task      coroutine       steps  total ms    max ms  lifetime ms  cancelled
+    Task-3    my_work             3     200.4     100.2        201.1      False
+    Task-2    forever             4       0.1       0.1        302.0       True
+    Task-4    do_stuff            3       0.1       0.1        301.7      False
+    Task-6    do_stuff            3       0.0       0.0        301.7      False
+"""
+
+import asyncio
+import collections.abc
+import time
+
+class CoroutineStats:
+
+    __slots__ = ("tasks", "steps", "total", "max", "lifetime", "cancelled")
+
+    def __init__(self):
+        self.tasks = self.steps = self.cancelled = 0
+        self.total = self.max = self.lifetime = 0.0
+
+class TaskStats:
+
+    __slots__ = ("name", "coroutine", "steps", "total", "max", "created", "lifetime", "cancelled")
+
+    def __init__(self, coroutine):
+        self.name = ""
+        self.coroutine = coroutine
+        self.steps = 0
+        self.total = self.max = self.lifetime = 0.0
+        self.created = time.perf_counter()
+        self.cancelled = False
+
+class ProfiledCoroutine(collections.abc.Coroutine):
+
+    __slots__ = ("_coro", "_stats", "_task_stats")
+
+    def __init__(self, coro, stats: CoroutineStats, task_stats: TaskStats):
+        self._coro = coro
+        self._stats = stats
+        self._task_stats = task_stats
+
+    def send(self, value):
+        start = time.perf_counter()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._step(time.perf_counter() - start)
+
+    def throw(self, *args):
+        start = time.perf_counter()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._step(time.perf_counter() - start)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    def _step(self, elapsed):
+        for stats in (self._stats, self._task_stats):
+            stats.steps += 1
+            stats.total += elapsed
+            if elapsed > stats.max:
+                stats.max = elapsed
+
+    def __getattr__(self, name):
+        # cr_frame, __qualname__ etc. are used by asyncio for repr() and debugging
+        return getattr(self._coro, name)
+
+class TaskProfiler:
+
+    def __init__(self, keep_finished=1000):
+        self.stats = collections.defaultdict(CoroutineStats)  # Coroutine name -> CoroutineStats
+        self.running = {}  # Task -> TaskStats
+        self.finished = collections.deque(maxlen=keep_finished)  # TaskStats of the last tasks done
+        self._previous_factory = None
+
+    def install(self, loop=None):
+        loop = loop or asyncio.get_running_loop()
+        self._previous_factory = loop.get_task_factory()
+        loop.set_task_factory(self._factory)
+
+    def uninstall(self, loop=None):
+        (loop or asyncio.get_running_loop()).set_task_factory(self._previous_factory)
+
+    def _factory(self, loop, coro, **kwargs):
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        stats = self.stats[name]
+        stats.tasks += 1
+        task_stats = TaskStats(name)
+        profiled = ProfiledCoroutine(coro, stats, task_stats)
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, profiled, **kwargs)
+        else:
+            task = asyncio.Task(profiled, loop=loop, **kwargs)
+        self.running[task] = task_stats
+        task.add_done_callback(lambda t: self._done(t, stats, task_stats))
+        return task
+
+    def _done(self, task, stats, task_stats):
+        del self.running[task]
+        task_stats.name = task.get_name()
+        task_stats.lifetime = time.perf_counter() - task_stats.created
+        task_stats.cancelled = task.cancelled()
+        self.finished.append(task_stats)
+        stats.lifetime += task_stats.lifetime
+        if task_stats.cancelled:
+            stats.cancelled += 1
+
+    def tasks(self):
+        """TaskStats of the running tasks and of the last tasks that are done."""
+        now = time.perf_counter()
+        for task, task_stats in self.running.items():
+            # create_task() names the task after the task factory, so take the name here
+            task_stats.name = task.get_name()
+            task_stats.lifetime = now - task_stats.created
+        return list(self.running.values()) + list(self.finished)
+
+    def report(self, top=10, per_task=False):
+        """Returns a text table of the top coroutines (or tasks), sorted by total step time."""
+        if per_task:
+            lines = [f"{'task':<10}{'coroutine':<15}{'steps':>6}{'total ms':>10}{'max ms':>10}"
+                     f"{'lifetime ms':>13}{'cancelled':>11}"]
+            ranked = sorted(self.tasks(), key=lambda t: t.total, reverse=True)
+            for t in ranked[:top]:
+                lines.append(f"{t.name:<10}{t.coroutine:<15}{t.steps:>6}{t.total * 1000:>10.1f}"
+                             f"{t.max * 1000:>10.1f}{t.lifetime * 1000:>13.1f}{str(t.cancelled):>11}")
+            return "\n".join(lines)
+        lines = [f"{'coroutine':<15}{'tasks':>7}{'steps':>8}{'total ms':>10}{'max ms':>10}"
+                 f"{'lifetime ms':>13}{'cancelled':>11}"]
+        ranked = sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True)
+        for name, s in ranked[:top]:
+            lines.append(f"{name:<15}{s.tasks:>7}{s.steps:>8}{s.total * 1000:>10.1f}{s.max * 1000:>10.1f}"
+                         f"{s.lifetime * 1000:>13.1f}{s.cancelled:>11}")
+        return "\n".join(lines)
+
+async def my_work():
+    for _ in range(2):
+        time.sleep(0.1)  # Blocks the event loop, will show up as total and max time
+        await asyncio.sleep(0)
+
+async def do_stuff():
+    for _ in range(2):
+        await asyncio.sleep(0.1)
+
+async def forever():
+    while True:
+        await asyncio.sleep(0.1)
+
+async def main():
+    profiler = TaskProfiler()
+    profiler.install()
+
+    task = asyncio.create_task(forever())
+    await asyncio.gather(my_work(), *(do_stuff() for _ in range(10)))
+    task.cancel()
+    await asyncio.wait([task])
+
+    profiler.uninstall()
+    print(profiler.report())
+    print()
+    print(profiler.report(top=4, per_task=True))
+
+if __name__ == "__main__":
+    asyncio.run(main())
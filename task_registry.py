@@ -0,0 +1,137 @@
+"""
+This demo shows a registry for fire-and-forget (background) tasks.
+
+exit_after_main.py creates tasks without keeping a reference to them. The event loop only keeps a
+weak reference to a task, so a task that nobody references can be garbage collected while it is
+still running, and the tasks are simply lost when main returns. An exception in such a task is only
+reported when the task is garbage collected, if ever.
+
+TaskRegistry.spawn() creates the task and keeps a strong reference to it until it is done, so it
+can't disappear. When a task fails, its exception is passed to the exception handler of the loop
+right away. report() lists the number of tasks and an estimate of the memory they hold per task
+kind (the task, its coroutine frames and the objects they reference, not counting shared
+objects twice), and the tasks that have been alive longer than max_age. A kind that keeps growing in
+count or memory between reports is a leak. close() cancels the remaining tasks and waits for them,
+so nothing is lost when main returns.
+
+Printout:
+    Starting my_task 1
+    Starting my_task 2
+    Background task failed
+    task: <Task finished name='Task-4' coro=<failing_task() done, ...> exception=ValueError('Bad input')>
+    Traceback (most recent call last):
+    ...
+    ValueError: Bad input
+    kind          tasks      bytes  too old
+    cache             1    1230370        1
+    my_task           2       3310        2
+    Closing
+    Exiting my_task 1
+    Exiting my_task 2
+    End of program
+"""
+
+import asyncio
+import collections
+import sys
+import time
+
+class TaskRegistry:
+
+    def __init__(self):
+        self.tasks = {}  # task -> (kind, creation time)
+
+    def spawn(self, coro, kind=None, name=None):
+        task = asyncio.create_task(coro, name=name)
+        kind = kind or getattr(coro, "__qualname__", "unknown")
+        self.tasks[task] = (kind, time.monotonic())
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task):
+        del self.tasks[task]
+        if not task.cancelled() and task.exception() is not None:
+            task.get_loop().call_exception_handler({
+                "message": "Background task failed",
+                "exception": task.exception(),
+                "task": task,
+            })
+
+    def report(self, max_age=60.0):
+        """Returns {kind: (number of tasks, estimated bytes, number of tasks older than max_age)}."""
+        now = time.monotonic()
+        counts = collections.Counter()
+        sizes = collections.Counter()
+        too_old = collections.Counter()
+        for task, (kind, created) in list(self.tasks.items()):
+            counts[kind] += 1
+            sizes[kind] += task_size(task)
+            too_old[kind] += now - created > max_age
+        return {kind: (counts[kind], sizes[kind], too_old[kind]) for kind in counts}
+
+    async def close(self, timeout=5.0):
+        for task in list(self.tasks):
+            task.cancel("Registry closed")
+        if self.tasks:
+            await asyncio.wait(list(self.tasks), timeout=timeout)
+
+def task_size(task, max_depth=4):
+    """Estimate of the memory held by a task: the task, all coroutine frames it awaits and the
+    objects referenced from their local variables, max_depth levels down."""
+    seen = set()
+
+    def size(obj, depth):
+        if id(obj) in seen or depth > max_depth:
+            return 0
+        seen.add(id(obj))
+        total = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            total += sum(size(k, depth + 1) + size(v, depth + 1) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+            total += sum(size(item, depth + 1) for item in obj)
+        return total
+
+    total = size(task, 0)
+    coro = task.get_coro()
+    while coro is not None and getattr(coro, "cr_frame", None) is not None:
+        total += size(coro.cr_frame, 0) + size(coro.cr_frame.f_locals, 0)
+        coro = coro.cr_await
+    return total
+
+async def my_task(i: int):
+    print(f"Starting my_task {i}")
+    try:
+        while True:
+            await asyncio.sleep(1)
+    except asyncio.CancelledError:
+        print(f"Exiting my_task {i}")
+        raise
+
+async def failing_task():
+    await asyncio.sleep(0.1)
+    raise ValueError("Bad input")
+
+async def cache_task():
+    # Leaks: keeps adding to a list that is never emptied
+    cache = []
+    while True:
+        cache.append(bytearray(1000))
+        await asyncio.sleep(0.001)
+
+async def main():
+    registry = TaskRegistry()
+    registry.spawn(my_task(1))
+    registry.spawn(my_task(2))
+    registry.spawn(failing_task())
+    registry.spawn(cache_task(), kind="cache")
+
+    await asyncio.sleep(1.5)
+    print(f"{'kind':<12}{'tasks':>7}{'bytes':>11}{'too old':>9}")
+    for kind, (count, size, too_old) in sorted(registry.report(max_age=1).items()):
+        print(f"{kind:<12}{count:>7}{size:>11}{too_old:>9}")
+
+    print("Closing")
+    await registry.close()
+
+asyncio.run(main())  # Blocks until main returns
+print("End of program")
@@ -0,0 +1,186 @@
+"""
+This demo shows an event loop with a virtual clock, to run the demos that wait a lot in a few
+milliseconds, with the same printouts in the same order.
+
+callback.py sleeps 2 and 4 seconds, event.py waits 10 seconds for a timeout and the Task1/Task2
+loops sleep 1 second per round, so going through their timeout and shutdown paths takes a long time
+even though the loop does nothing while waiting. VirtualTimeEventLoop.time() returns a virtual
+clock that starts at 0. When the loop is about to wait for its next timer and there is no I/O ready,
+it doesn't wait but moves the clock forward to that timer, so everything that uses the loop time
+(asyncio.sleep(), wait_for(), call_later(), loop.time() itself) runs as usual, just without the
+waiting.
+Work sent to run_in_executor() takes real time, so while any such call is running the loop waits
+in real time and the clock moves with it. Note that time.sleep() (like in sleep.py) still blocks
+for real, and that threads started without run_in_executor(), or I/O from other processes, are not
+waited for, so their timeouts fire right away.
+
+Run the demos given on the command line (by default callback.py and event.py, and
+project_example2/main.py with a ctrl+c after 5.5 seconds) on the virtual clock:
+    python virtual_time.py [--sigint-after SECONDS] [demo.py ...]
+
+Printout:
+    ==== callback.py
+    Started
+    In between
+    get_name started by b
+    get_name started by task
+    In callback: Got Kalle
+    In main: Ada
+    Exited
+    ==== 4.000 virtual seconds in 0.002 real seconds
+    ==== event.py
+    Main starts
+    Main waiting for QUIT
+    Executing my_task
+    ...
+    Executing my_task
+    Timed out
+    Exiting main
+    Executing my_task
+    ==== 10.000 virtual seconds in 0.004 real seconds
+    ==== project_example2/main.py (ctrl+c after 5.5s)
+    Main started
+    Running Task1
+    Task1 executing
+    Running Task2
+    Task2 executing
+    Task1 executing
+    Task2 executing
+    ...
+
+    sig_handler: got signal ctrl+c - Exit gracefully!!
+    Waiting for all tasks to be closed...
+    Closing Task1, reason: Ctrl+c pressed
+    Closing Task2, reason: Ctrl+c pressed
+    Task2 received a request to cancel because of Ctrl+c pressed, cleaning up task!!
+    Task2 cleaned up and exiting
+    Task1 closed in 0.0s
+    Task2 closed in 0.0s
+    Main done
+    ==== 5.500 virtual seconds in 0.007 real seconds
+    ==== executor work
+    3 executor calls of 0.2s and a 60s timeout: 60.200 virtual seconds in 0.203 real seconds
+"""
+
+import argparse
+import asyncio
+import os
+import runpy
+import selectors
+import signal
+import sys
+import time
+
+class _VirtualSelector(selectors.DefaultSelector):
+
+    loop = None
+
+    def select(self, timeout=None):
+        loop = self.loop
+        if timeout is not None and timeout > 0 and not loop.executor_calls:
+            # Nothing to wait for but timers, so only poll and jump to the next timer
+            events = super().select(0)
+            if not events:
+                loop.advance(timeout)
+            return events
+        start = time.monotonic()
+        events = super().select(timeout)
+        elapsed = time.monotonic() - start
+        loop.advance(elapsed if timeout is None else min(elapsed, timeout))
+        return events
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+
+    def __init__(self):
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self.virtual_time = 0.0
+        self.executor_calls = 0  # Running run_in_executor() calls, waited for in real time
+
+    def time(self):
+        return self.virtual_time
+
+    def advance(self, seconds):
+        self.virtual_time += seconds
+
+    def run_in_executor(self, executor, func, *args):
+        fut = super().run_in_executor(executor, func, *args)
+        self.executor_calls += 1
+        fut.add_done_callback(self._executor_call_done)
+        return fut
+
+    def _executor_call_done(self, _fut):
+        self.executor_calls -= 1
+
+class VirtualTimeEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    """Makes asyncio.run() use a VirtualTimeEventLoop, for code that can't be changed."""
+
+    def __init__(self, on_new_loop=None):
+        super().__init__()
+        self.loops = []
+        self._on_new_loop = on_new_loop
+
+    def new_event_loop(self):
+        loop = VirtualTimeEventLoop()
+        self.loops.append(loop)
+        if self._on_new_loop is not None:
+            self._on_new_loop(loop)
+        return loop
+
+def run(main, debug=None):
+    """Like asyncio.run(), but on a virtual clock."""
+    with asyncio.Runner(debug=debug, loop_factory=VirtualTimeEventLoop) as runner:
+        return runner.run(main)
+
+def run_demo(path, sigint_after=None):
+    def send_sigint(loop):
+        loop.call_later(sigint_after, os.kill, os.getpid(), signal.SIGINT)
+
+    policy = VirtualTimeEventLoopPolicy(send_sigint if sigint_after is not None else None)
+    asyncio.set_event_loop_policy(policy)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))  # For the imports of the demo
+    start = time.monotonic()
+    try:
+        runpy.run_path(path, run_name="__main__")
+    finally:
+        sys.path.pop(0)
+        asyncio.set_event_loop_policy(None)
+    virtual = sum(loop.time() for loop in policy.loops)
+    print(f"==== {virtual:.3f} virtual seconds in {time.monotonic() - start:.3f} real seconds")
+
+async def executor_work():
+    loop = asyncio.get_running_loop()
+    calls = [loop.run_in_executor(None, time.sleep, 0.2) for _ in range(3)]
+    await asyncio.gather(*calls)
+    try:
+        await asyncio.wait_for(asyncio.Event().wait(), 60)
+    except TimeoutError:
+        return loop.time()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sigint-after", type=float, default=None,
+                        help="send ctrl+c to the demos after this many virtual seconds")
+    parser.add_argument("demos", nargs="*")
+    args = parser.parse_args()
+
+    demos = [(path, args.sigint_after) for path in args.demos]
+    if not demos:
+        here = os.path.dirname(os.path.abspath(__file__))
+        demos = [(os.path.join(here, "callback.py"), None), (os.path.join(here, "event.py"), None),
+                 (os.path.join(here, "project_example2", "main.py"), 5.5)]
+    for path, sigint_after in demos:
+        name = os.path.relpath(path)
+        print(f"==== {name}" + (f" (ctrl+c after {sigint_after}s)" if sigint_after is not None else ""))
+        run_demo(path, sigint_after)
+
+    if not args.demos:
+        print("==== executor work")
+        start = time.monotonic()
+        virtual = run(executor_work())
+        print(f"3 executor calls of 0.2s and a 60s timeout: {virtual:.3f} virtual seconds in "
+              f"{time.monotonic() - start:.3f} real seconds")
+
+if __name__ == "__main__":
+    main()